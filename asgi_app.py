@@ -0,0 +1,547 @@
+"""ASGI entry point for the Campaign Inventory dashboard.
+
+The read endpoints the dashboard polls (inventory listing, brand overview,
+product breakdown, dashboard summary, weekly comparison and clients) are
+served natively on psycopg 3 async connections, with the per-brand queries
+run concurrently. Every other route, and the inventory modes that need the
+sync code paths (delta sync, columnar), goes through the Flask app in
+simple_dashboard, which stays the compatibility path under gunicorn.
+
+    uvicorn asgi_app:app --host 0.0.0.0 --port $PORT
+"""
+import asyncio
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qsl
+
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+
+import db_driver
+import simple_dashboard as dashboard
+
+ASGI_POOL_MIN_SIZE = int(os.getenv('ASGI_POOL_MIN_SIZE', '2'))
+ASGI_POOL_MAX_SIZE = int(os.getenv('ASGI_POOL_MAX_SIZE', '20'))
+ASGI_WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', '16'))
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+    (b'access-control-expose-headers',
+     b'X-Data-Source, X-Data-Refreshed-At, X-Data-Age-Seconds, X-Cache, '
+     b'X-Partial, X-Brand-Status, X-Database'),
+]
+
+
+def _conninfo(dsn):
+    """psycopg 3 connection string for a DSN or URL"""
+    # Text comes back as str even from SQL_ASCII databases
+    return make_conninfo(dsn, client_encoding='utf8')
+
+
+# One pool for the primary and one per replica; reads go to whichever
+# simple_dashboard.database_target picks from the replica lag checks
+pools = {
+    dashboard.PRIMARY: AsyncConnectionPool(_conninfo(db_driver.PRIMARY_DSN),
+                                           min_size=ASGI_POOL_MIN_SIZE,
+                                           max_size=ASGI_POOL_MAX_SIZE, open=False),
+}
+for replica_url in dashboard.DB_REPLICA_URLS:
+    pools[replica_url] = AsyncConnectionPool(
+        _conninfo(replica_url),
+        min_size=ASGI_POOL_MIN_SIZE, max_size=ASGI_POOL_MAX_SIZE, open=False)
+
+# Flask requests run here so they never block the event loop
+_wsgi_executor = ThreadPoolExecutor(max_workers=ASGI_WSGI_THREADS,
+                                    thread_name_prefix='wsgi')
+
+
+class RequestContext:
+    """Per-request deadline and brand statuses, like Flask's g"""
+
+    def __init__(self, headers):
+        budget = dashboard.REQUEST_DEADLINE
+        requested = headers.get('x-request-timeout')
+        if requested:
+            try:
+                budget = min(budget, float(requested))
+            except ValueError:
+                pass
+        self.deadline = time.time() + budget
+        # Every query of a request reads from the same server
+        self.target = dashboard.database_target('replica')
+        self.brand_status = {}
+        self.data_source = None
+        self.data_refreshed_at = None
+
+    def remaining_time(self):
+        return self.deadline - time.time()
+
+    def is_partial(self):
+        return any(status in ('timeout', 'canceled')
+                   for status in self.brand_status.values())
+
+
+async def fetch_all(statement, params, ctx, profile='interactive'):
+    """Run one registered statement on a pooled connection.
+
+    The statement runs under an execution profile and the request deadline,
+    and psycopg 3 prepares it on the connection the first time it runs there.
+    """
+    remaining = ctx.remaining_time()
+    if remaining <= 0:
+        raise dashboard.DeadlineExceeded()
+    async with pools[ctx.target].connection(timeout=remaining) as conn:
+        async with conn.transaction():
+            settings, settings_params = dashboard.execution_profile_statement(
+                profile, ctx.remaining_time())
+            await conn.execute(dashboard.statement_text(settings), settings_params,
+                               prepare=dashboard.PREPARED_STATEMENTS)
+            started = time.time()
+            try:
+                cursor = await conn.execute(
+                    dashboard.statement_text(statement), params,
+                    prepare=dashboard.PREPARED_STATEMENTS)
+                rows = await cursor.fetchall()
+                dashboard.record_query_timing(profile, statement['key'][0], time.time() - started)
+                return rows
+            except asyncio.CancelledError:
+                # The client went away: stop the statement on the server too
+                await conn.cancel_safe()
+                raise
+
+
+async def fetch_per_brand(build_query, ctx, brand=None, profile='interactive'):
+    """Run one query per brand concurrently.
+
+    Returns {brand_code: rows}; a brand that fails or runs out of time is
+    left out and its status recorded on the request context.
+    """
+    async def run(table, brand_code):
+        statement, params = build_query(table, brand_code)
+        try:
+            rows = await fetch_all(statement, params, ctx, profile)
+        except Exception as e:
+            if (isinstance(e, (dashboard.DeadlineExceeded, PoolTimeout))
+                    or dashboard.is_query_canceled(e)):
+                ctx.brand_status[brand_code] = 'timeout'
+            else:
+                print(f"Async query for {brand_code} failed: {e}")
+                ctx.brand_status[brand_code] = 'error'
+            return brand_code, None
+        ctx.brand_status[brand_code] = 'ok'
+        return brand_code, rows
+
+    brands = [(table, brand_code) for table, brand_code in dashboard.BRAND_TABLES
+              if not brand or brand == brand_code]
+    for _, brand_code in brands:
+        # Keeps X-Brand-Status in listing order whichever brand finishes first
+        ctx.brand_status.setdefault(brand_code, 'ok')
+    results = await asyncio.gather(*(run(table, brand_code) for table, brand_code in brands))
+    return {brand_code: rows for brand_code, rows in results if rows is not None}
+
+
+# Rollups: shared by concurrent callers and cached like the sync path
+_rollup_cache = {}     # (start_date, end_date) -> (fetched_at, rollup, brand_status)
+_rollup_flights = {}   # (start_date, end_date) -> in-flight task
+_aggregate_refresh = None
+
+
+def _refresh_aggregates_in_background():
+    """Bring the incremental aggregates up to date on a worker thread"""
+    global _aggregate_refresh
+    if _aggregate_refresh is None or _aggregate_refresh.done():
+        loop = asyncio.get_running_loop()
+        _aggregate_refresh = loop.run_in_executor(
+            _wsgi_executor, dashboard.refresh_inventory_aggregates)
+
+
+async def _query_rollup(start_date, end_date, ctx):
+    """Run the rollup once per brand and merge the results"""
+    def build_query(table, brand_code):
+        return dashboard.inventory_rollup_query(start_date, end_date, table, brand_code)
+
+    by_brand_rows = await fetch_per_brand(build_query, ctx, profile='aggregate')
+    # Per-brand grand totals are summed rather than taken from each query
+    rows = [row for brand_rows in by_brand_rows.values() for row in brand_rows
+            if row[2] != 3]
+    rollup = dashboard.rollup_from_rows(rows)
+    for counts in rollup['by_brand'].values():
+        for key, value in counts.items():
+            rollup['totals'][key] += value
+    return rollup, dict(ctx.brand_status)
+
+
+async def get_rollup(start_date, end_date, ctx):
+    """Async counterpart of simple_dashboard.get_inventory_rollup"""
+    if dashboard.INCREMENTAL_AGGREGATES:
+        state = dashboard._aggregate_state
+        if time.time() - state['last_refresh'] >= dashboard.AGGREGATE_REFRESH_INTERVAL:
+            _refresh_aggregates_in_background()
+        if state['loaded']:
+            ctx.data_source, ctx.data_refreshed_at = 'aggregates', state['refreshed_at']
+            for _, brand_code in dashboard.BRAND_TABLES:
+                error = state['brand_errors'].get(brand_code)
+                if error is None:
+                    ctx.brand_status[brand_code] = 'ok'
+                elif brand_code in state['watermarks']:
+                    ctx.brand_status[brand_code] = 'stale'
+                else:
+                    ctx.brand_status[brand_code] = 'timeout' if error == 'timeout' else 'error'
+            return dashboard._counts_from_aggregates(start_date, end_date)
+
+    ctx.data_source, ctx.data_refreshed_at = dashboard.latest_slots_freshness()
+    key = (start_date, end_date)
+    cached = _rollup_cache.get(key)
+    if cached and time.time() - cached[0] < dashboard.AGGREGATE_REFRESH_INTERVAL:
+        ctx.brand_status.update(cached[2])
+        return cached[1]
+
+    flight = _rollup_flights.get(key)
+    if flight is None:
+        # The flight has its own context so one caller's deadline or
+        # disconnect does not cut it short for the others
+        flight = asyncio.ensure_future(_query_rollup(start_date, end_date, RequestContext({})))
+        _rollup_flights[key] = flight
+        flight.add_done_callback(lambda _: _rollup_flights.pop(key, None))
+
+    try:
+        rollup, brand_status = await asyncio.wait_for(
+            asyncio.shield(flight), max(ctx.remaining_time(), 0))
+    except asyncio.TimeoutError:
+        # Out of time: answer with empty counts flagged as partial
+        for _, brand_code in dashboard.BRAND_TABLES:
+            ctx.brand_status[brand_code] = 'timeout'
+        return dashboard.rollup_from_rows([])
+    ctx.brand_status.update(brand_status)
+    if not any(status != 'ok' for status in brand_status.values()):
+        dashboard.cache_rollup(_rollup_cache, key, (time.time(), rollup, brand_status))
+    return rollup
+
+
+async def get_form_submissions(start_date, end_date, ctx):
+    """Async counterpart of simple_dashboard.get_form_submissions_for_week"""
+    try:
+        rows = await fetch_all(dashboard.form_submissions_statement(), (start_date, end_date),
+                               ctx, 'aggregate')
+    except Exception as e:
+        print(f"Error getting form submissions from data_products.sponsorship_bookings_form_submissions: {e}")
+        return dict(dashboard.FORM_SUBMISSIONS_FALLBACK)
+    form_submissions = {brand_code: 0 for _, brand_code in dashboard.BRAND_TABLES}
+    form_submissions.update({brand_code: count for brand_code, count in rows})
+    return form_submissions
+
+
+async def inventory_view(args, ctx):
+    try:
+        limit = int(args.get('limit', 100))
+    except ValueError:
+        limit = 100
+    brand = args.get('brand')
+
+    def build_query(table, brand_code):
+        return dashboard.brand_page_query(
+            dashboard.inventory_json_query, limit, brand_code, brand, args.get('status'),
+            args.get('client'), args.get('product'), args.get('start_date'), args.get('end_date'))
+
+    by_brand_rows = await fetch_per_brand(build_query, ctx, brand)
+    ctx.data_source, ctx.data_refreshed_at = dashboard.latest_slots_freshness()
+
+    # Brands are concatenated in listing order until the page is full; no
+    # booking ID is listed under two brands
+    fragments = []
+    remaining = limit
+    for _, brand_code in dashboard.BRAND_TABLES:
+        if brand_code not in by_brand_rows or remaining <= 0:
+            continue
+        payload, count = by_brand_rows[brand_code][0]
+        if not count:
+            continue
+        if count > remaining:
+            payload = json.dumps(json.loads(payload)[:remaining])
+            count = remaining
+        fragments.append(payload.strip()[1:-1])
+        remaining -= count
+
+    if fragments:
+        return 200, ('[' + ', '.join(fragments) + ']').encode('utf-8')
+    return 200, {
+        "error": "No data found",
+        "debug": {
+            "tables_processed": len(dashboard.BRAND_TABLES),
+            "brand_filter": brand,
+            "message": "Check server logs for detailed debug information"
+        }
+    }
+
+
+async def brand_overview_view(args, ctx):
+    start_date, end_date = args.get('start_date'), args.get('end_date')
+    rollup = await get_rollup(start_date, end_date, ctx)
+    summary = dashboard.get_inventory_summary(start_date, end_date, rollup=rollup)
+    return 200, dashboard.format_brand_overview(summary)
+
+
+async def brand_product_breakdown_view(args, ctx):
+    rollup = await get_rollup(args.get('start_date'), args.get('end_date'), ctx)
+    return 200, dashboard.format_product_breakdown(rollup)
+
+
+async def dashboard_summary_view(args, ctx):
+    start_date, end_date = args.get('start_date'), args.get('end_date')
+    rollup = await get_rollup(start_date, end_date, ctx)
+    summary = dashboard.get_inventory_summary(start_date, end_date, rollup=rollup)
+    return 200, {
+        'totals': {
+            'total_slots': summary['total_slots'],
+            'booked': summary['booked'],
+            'available': summary['available'],
+            'on_hold': summary['on_hold']
+        },
+        'brand_overview': dashboard.format_brand_overview(summary),
+        'product_breakdown': dashboard.format_product_breakdown(rollup)
+    }
+
+
+async def weekly_comparison_view(args, ctx):
+    today = datetime.now()
+    monday = today - timedelta(days=today.weekday())
+    sunday = monday + timedelta(days=6)
+    week_range = f"{monday.strftime('%b %d, %Y')} to {sunday.strftime('%b %d, %Y')}"
+    start_date = monday.strftime('%Y-%m-%d')
+    end_date = sunday.strftime('%Y-%m-%d')
+
+    rollup, form_submissions = await asyncio.gather(
+        get_rollup(start_date, end_date, ctx),
+        get_form_submissions(monday, sunday, ctx))
+    summary = dashboard.get_inventory_summary(start_date, end_date, rollup=rollup)
+
+    return 200, {
+        'week_range': week_range,
+        'data': [
+            {
+                'brand': brand_code,
+                'scheduled': data['booked'],
+                'form_submissions': form_submissions.get(brand_code, 0)
+            }
+            for brand_code, data in summary['by_brand'].items()
+        ]
+    }
+
+
+async def clients_view(args, ctx):
+    def build_query(table, brand_code):
+        return dashboard.clients_query(table, brand_code)
+
+    by_brand_rows = await fetch_per_brand(build_query, ctx, profile='aggregate')
+    all_clients = {row[0] for rows in by_brand_rows.values() for row in rows}
+    return 200, [{'client_name': name} for name in sorted(all_clients)]
+
+
+async def healthz_view(args, ctx):
+    return 200, {'status': 'ok', 'pid': os.getpid()}
+
+
+async def readyz_view(args, ctx):
+    # Answered from the health prober's snapshot, never from the database
+    status = dashboard.health_status()
+    return (200 if status['serving'] else 503), status
+
+
+NATIVE_ROUTES = {
+    '/healthz': healthz_view,
+    '/readyz': readyz_view,
+    '/api/inventory': inventory_view,
+    '/api/brand-overview': brand_overview_view,
+    '/api/brand-product-breakdown': brand_product_breakdown_view,
+    '/api/dashboard-summary': dashboard_summary_view,
+    '/api/weekly-comparison': weekly_comparison_view,
+    '/api/clients': clients_view,
+}
+
+
+def native_view(scope, args):
+    """The async view for a request, or None to hand it to Flask"""
+    if scope['method'] != 'GET':
+        return None
+    if scope['path'] == '/api/inventory' and (
+            args.get('since') or args.get('format', 'objects') == 'columnar'
+            or dashboard.INVENTORY_JSON_MODE != 'database'):
+        return None
+    return NATIVE_ROUTES.get(scope['path'])
+
+
+async def _wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+def _response_headers(ctx, body, content_type, accept_encoding):
+    headers = [(b'content-type', content_type)] + CORS_HEADERS
+    if ctx.data_source:
+        headers.append((b'x-data-source', ctx.data_source.encode('latin-1')))
+        if ctx.data_refreshed_at:
+            age = datetime.now(timezone.utc) - ctx.data_refreshed_at
+            headers.append((b'x-data-refreshed-at', ctx.data_refreshed_at.isoformat().encode('latin-1')))
+            headers.append((b'x-data-age-seconds', str(int(age.total_seconds())).encode('latin-1')))
+    headers.append((b'x-database', b'replica' if ctx.target != dashboard.PRIMARY else b'primary'))
+    if ctx.brand_status:
+        headers.append((b'x-brand-status', ','.join(
+            f'{brand_code}={status}' for brand_code, status in ctx.brand_status.items()
+        ).encode('latin-1')))
+        if ctx.is_partial():
+            headers.append((b'x-partial', b'true'))
+
+    if len(body) >= dashboard.COMPRESSION_MIN_SIZE:
+        headers.append((b'vary', b'Accept-Encoding'))
+        encoding = dashboard.negotiate_encoding(accept_encoding)
+        if encoding:
+            body = dashboard.compress_body(body, encoding)
+            headers.append((b'content-encoding', encoding.encode('latin-1')))
+    headers.append((b'content-length', str(len(body)).encode('latin-1')))
+    return headers, body
+
+
+async def serve_native(view, scope, receive, send, args, headers):
+    """Run an async view, canceling it if the client goes away"""
+    ctx = RequestContext(headers)
+    task = asyncio.ensure_future(view(args, ctx))
+    watcher = asyncio.ensure_future(_wait_for_disconnect(receive))
+    done, _ = await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    if task not in done:
+        # Canceling the task cancels its queries on the server too
+        task.cancel()
+        return
+    watcher.cancel()
+
+    try:
+        status, payload = task.result()
+    except Exception as e:
+        print(f"ASGI {scope['path']} Error: {e}")
+        status, payload = 500, {"error": str(e)}
+    body = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+
+    response_headers, body = _response_headers(
+        ctx, body, b'application/json', headers.get('accept-encoding', ''))
+    await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def _wsgi_environ(scope, body):
+    """WSGI environ for an ASGI HTTP scope"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'REMOTE_ADDR': client[0],
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name, value = name.decode('latin-1'), value.decode('latin-1')
+        if name == 'content-type':
+            environ['CONTENT_TYPE'] = value
+        elif name != 'content-length':
+            key = 'HTTP_' + name.upper().replace('-', '_')
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+async def serve_flask(scope, receive, send):
+    """Run the request through the Flask app on a worker thread.
+
+    The body is streamed chunk by chunk, so exports and the SSE stream work
+    as they do under gunicorn, and stops once the client disconnects.
+    """
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+
+    loop = asyncio.get_running_loop()
+    started = {}
+
+    def start_response(status, response_headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                              for name, value in response_headers]
+
+    iterable = await loop.run_in_executor(
+        _wsgi_executor, dashboard.app, _wsgi_environ(scope, body), start_response)
+    chunks = iter(iterable)
+    watcher = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        chunk = await loop.run_in_executor(_wsgi_executor, next, chunks, None)
+        await send({'type': 'http.response.start', 'status': started['status'],
+                    'headers': started['headers']})
+        while chunk is not None and not watcher.done():
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            chunk = await loop.run_in_executor(_wsgi_executor, next, chunks, None)
+        if not watcher.done():
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        watcher.cancel()
+        if hasattr(iterable, 'close'):
+            await loop.run_in_executor(_wsgi_executor, iterable.close)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            try:
+                for pool in pools.values():
+                    await pool.open()
+            except Exception as e:
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                return
+            dashboard.start_worker(dashboard.app)
+            print(f"ASGI app {dashboard.boot_summary()}; connection pools open "
+                  f"({len(pools)} servers, max {ASGI_POOL_MAX_SIZE} connections each)")
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            for pool in pools.values():
+                await pool.close()
+            _wsgi_executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    args = dict(parse_qsl(scope['query_string'].decode('latin-1')))
+    view = native_view(scope, args)
+    if view is None:
+        await serve_flask(scope, receive, send)
+        return
+    headers = {name.decode('latin-1'): value.decode('latin-1')
+               for name, value in scope['headers']}
+    await serve_native(view, scope, receive, send, args, headers)
@@ -0,0 +1,189 @@
+"""Postgres driver adapter for simple_dashboard and asgi_app.
+
+The driver (psycopg2, else psycopg 3) is picked once at import, and the
+connection string is built once from DATABASE_URL or the DB_* variables.
+Callers go through the functions below instead of checking which driver
+they got:
+
+    connect(dsn=None, **params)     open a connection (primary by default)
+    execute(cursor, query, params, prepare=None)
+    fetch_all(cursor, query, params, prepare=None)
+    server_cursor(conn, name)       named cursor; rows arrive as fetched
+    stream(cursor, batch_size)      batches of rows from an executed cursor
+    cancel(conn)                    cancel the running statement
+    error_code(error)               SQLSTATE of a driver error
+"""
+import itertools
+import os
+import re
+import threading
+import time
+import weakref
+
+_detect_started = time.time()
+
+try:
+    import psycopg2 as driver
+    import psycopg2.extensions
+    DRIVER = 'psycopg2'
+except ImportError:
+    try:
+        import psycopg as driver
+        DRIVER = 'psycopg'
+    except ImportError:
+        driver = None
+        DRIVER = None
+
+AVAILABLE = driver is not None
+VERSION = driver.__version__.split()[0] if AVAILABLE else None
+
+# Query composition: psycopg 3's sql module renders without a connection;
+# psycopg2's needs one, so statements are then rendered on first use
+try:
+    from psycopg import sql
+    SQL_NEEDS_CONNECTION = False
+except ImportError:
+    from psycopg2 import sql
+    SQL_NEEDS_CONNECTION = True
+
+DETECT_SECONDS = time.time() - _detect_started
+
+# Database configuration, in libpq keywords; DATABASE_URL replaces it
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'dbname': os.getenv('DB_NAME', 'campaign_metadata'),
+    'user': os.getenv('DB_USER', 'postgres'),
+    'password': os.getenv('DB_PASSWORD', 'password'),
+    'port': os.getenv('DB_PORT', '5432')
+}
+
+
+def make_dsn(dsn='', **params):
+    """A libpq connection string from a DSN or URL plus keyword overrides"""
+    if DRIVER == 'psycopg2':
+        return psycopg2.extensions.make_dsn(dsn or None, **params)
+    from psycopg.conninfo import make_conninfo
+    return make_conninfo(dsn, **params)
+
+
+def _primary_dsn():
+    url = os.getenv('DATABASE_URL', '').strip()
+    if url:
+        return url
+    return make_dsn(**DB_CONFIG) if AVAILABLE else None
+
+
+PRIMARY_DSN = _primary_dsn()
+
+
+def describe():
+    """Driver name and version, e.g. 'psycopg2 2.9.9'"""
+    return f"{DRIVER} {VERSION}" if AVAILABLE else "no PostgreSQL driver"
+
+
+def connect(dsn=None, **params):
+    """Open a connection to dsn, or to the primary database"""
+    if not AVAILABLE:
+        raise Exception("Neither psycopg2 nor psycopg available")
+    return driver.connect(dsn or PRIMARY_DSN, **params)
+
+
+def make_cooperative(wait_read, wait_write):
+    """Make driver waits yield to other greenlets under gevent.
+
+    psycopg2 blocks in libpq unless given a wait callback; psycopg 3 waits
+    on the selectors module, which gevent has already patched.
+    """
+    if DRIVER != 'psycopg2':
+        return
+
+    def wait_callback(conn, timeout=None):
+        while True:
+            state = conn.poll()
+            if state == psycopg2.extensions.POLL_OK:
+                break
+            elif state == psycopg2.extensions.POLL_READ:
+                wait_read(conn.fileno(), timeout=timeout)
+            elif state == psycopg2.extensions.POLL_WRITE:
+                wait_write(conn.fileno(), timeout=timeout)
+            else:
+                raise psycopg2.OperationalError(f"Bad result from poll: {state}")
+
+    psycopg2.extensions.set_wait_callback(wait_callback)
+
+
+# Statements prepared server-side, by connection
+_prepared_lock = threading.Lock()
+_prepared = weakref.WeakKeyDictionary()     # connection -> statement names
+
+
+def _positional_placeholders(text):
+    """Turn %s placeholders into $1, $2, ... for PREPARE"""
+    numbers = itertools.count(1)
+    return re.sub(r'%[s%]', lambda m: f'${next(numbers)}' if m.group() == '%s' else '%', text)
+
+
+def execute(cursor, query, params=(), prepare=None):
+    """Execute query on a cursor, prepared server-side under the name prepare.
+
+    psycopg 3 prepares it itself given prepare=True. psycopg2 has no
+    server-side prepare of its own, so the query is PREPAREd the first
+    time a connection runs it and EXECUTEd from then on.
+    """
+    if prepare is None:
+        cursor.execute(query, params)
+        return
+    if DRIVER != 'psycopg2':
+        cursor.execute(query, params, prepare=True)
+        return
+
+    conn = cursor.connection
+    with _prepared_lock:
+        prepared = _prepared.setdefault(conn, set())
+    if prepare not in prepared:
+        # PREPARE is not undone by a rollback, so this holds for the
+        # connection's lifetime, across pool checkouts
+        cursor.execute(f"PREPARE {prepare} AS {_positional_placeholders(query)}")
+        prepared.add(prepare)
+    if params:
+        cursor.execute(f"EXECUTE {prepare} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        cursor.execute(f"EXECUTE {prepare}")
+
+
+def fetch_all(cursor, query, params=(), prepare=None):
+    """Execute query and return all of its rows"""
+    execute(cursor, query, params, prepare)
+    return cursor.fetchall()
+
+
+def server_cursor(conn, name):
+    """A named cursor: the query runs server-side and rows arrive as fetched"""
+    return conn.cursor(name=f'{name}_{threading.get_ident()}')
+
+
+def stream(cursor, batch_size):
+    """Yield batches of up to batch_size rows until the cursor is exhausted"""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows
+
+
+def cancel(conn):
+    """Ask the server to cancel the statement conn is running"""
+    if hasattr(conn, 'cancel_safe'):
+        conn.cancel_safe()
+    else:
+        conn.cancel()
+
+
+def error_code(error):
+    """SQLSTATE of a driver error, or None"""
+    return getattr(error, 'pgcode', None) or getattr(error, 'sqlstate', None)
+
+
+def prepared_connection_count():
+    with _prepared_lock:
+        return len(_prepared)
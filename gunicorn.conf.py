@@ -0,0 +1,91 @@
+"""gunicorn settings for simple_dashboard, chosen by WORKER_PROFILE.
+
+    gthread (default)  a thread per in-flight request; see below for how
+                       many per worker
+    gevent             a greenlet per request; Postgres waits yield, so one
+                       worker serves many slow queries at once
+
+    gunicorn simple_dashboard:app --config gunicorn.conf.py
+
+The gevent worker patches the process before importing the app, so the
+app's locks, queues and sockets are the cooperative versions. Settings
+below are only defaults; environment variables still override them.
+
+With the gthread profile the app is imported once in the master and
+forked (PRELOAD_APP=false turns this off). gevent workers always import
+it themselves, after patching. Either way each worker starts its
+background jobs and warmup once it is up, and logs how long it took from
+fork to serving.
+
+gthread workers get one thread for every request the app can hold at
+once, so admission control, not the thread pool, decides what waits:
+each admission budget's running plus queued requests (inventory 2+2,
+export 1+1, summary 3+3, debug 1 = 13), one per SSE subscriber (4), and
+GTHREAD_HEADROOM (4) for the unbudgeted routes such as /, /healthz and
+/readyz. That is 21 by default; GTHREAD_THREADS sets it outright.
+"""
+import os
+import time
+
+WORKER_PROFILE = os.getenv('WORKER_PROFILE', 'gthread')
+
+
+
+# The app's default admission budgets, as an ADMISSION_LIMITS string
+DEFAULT_ADMISSION_LIMITS = 'inventory=2:2,export=1:1,summary=3:3,debug=1:0'
+
+
+def _admission_slots(*limits):
+    """Requests the admission budgets hold at once, running plus queued.
+
+    Takes ADMISSION_LIMITS strings; later ones override earlier budgets by
+    name, as the app applies ADMISSION_LIMITS over its defaults.
+    """
+    budgets = {}
+    for item in ','.join(limits).split(','):
+        name, _, value = item.strip().partition('=')
+        concurrency, _, queue_size = value.partition(':')
+        try:
+            budgets[name] = int(concurrency) + int(queue_size or 0)
+        except ValueError:
+            continue
+    return sum(budgets.values())
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '1'))
+
+if WORKER_PROFILE == 'gevent':
+    worker_class = 'gevent'
+    # Preloading would create the app's locks before the worker patches them
+    preload_app = False
+    worker_connections = int(os.getenv('GEVENT_WORKER_CONNECTIONS', '200'))
+    # Greenlets are cheap: keep more connections and admit more requests
+    # per worker than the thread profile can afford
+    os.environ.setdefault('DB_POOL_SIZE', '20')
+    os.environ.setdefault('ADMISSION_LIMITS', 'inventory=20:40,export=2:2,summary=40:80,debug=1:0')
+    os.environ.setdefault('SSE_MAX_SUBSCRIBERS', '100')
+elif WORKER_PROFILE == 'gthread':
+    worker_class = 'gthread'
+    threads = int(os.getenv('GTHREAD_THREADS') or
+                  _admission_slots(DEFAULT_ADMISSION_LIMITS, os.getenv('ADMISSION_LIMITS', '')) +
+                  int(os.getenv('SSE_MAX_SUBSCRIBERS', '4')) +
+                  int(os.getenv('GTHREAD_HEADROOM', '4')))
+    preload_app = os.getenv('PRELOAD_APP', 'true').lower() != 'false'
+else:
+    raise ValueError(f"Unknown WORKER_PROFILE {WORKER_PROFILE!r} (use gthread or gevent)")
+
+
+def post_fork(server, worker):
+    worker.boot_started = time.time()
+
+
+def post_worker_init(worker):
+    import simple_dashboard
+    elapsed = time.time() - worker.boot_started
+    simple_dashboard.note_worker_boot(elapsed)
+    worker.log.info("Worker %s booted in %.2fs, app %s", worker.pid, elapsed,
+                    simple_dashboard.boot_summary())
+    # Threads and connections are per process, so they start here rather
+    # than in a preloading master
+    simple_dashboard.start_worker(worker.wsgi)
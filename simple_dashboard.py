@@ -1,79 +1,486 @@
 import os
+import io
+import csv
+import gzip
 import json
-from datetime import datetime, timedelta
-from flask import Flask, jsonify, request, render_template_string
+import functools
+import contextlib
+import hashlib
+import threading
+import queue
+import select
+import socket
+import time
+import weakref
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse
+
+# Worker boot time is measured from here, before the heavier imports
+BOOT_STARTED = time.time()
+
+from flask import (Blueprint, Flask, Response, current_app, g, has_request_context, jsonify,
+                   render_template_string, request)
 from flask_cors import CORS
 
-# Try to import psycopg2, fallback to psycopg if not available
+# psycopg2 or psycopg 3, detected once; see db_driver
+import db_driver
+from db_driver import sql, SQL_NEEDS_CONNECTION
+
+# brotli is optional; gzip is used when it is missing
 try:
-    import psycopg2
-    PSYCOPG_AVAILABLE = True
-    print("Using psycopg2 for PostgreSQL connection")
+    import brotli
+    BROTLI_AVAILABLE = True
 except ImportError:
-    try:
-        import psycopg
-        psycopg2 = psycopg
-        PSYCOPG_AVAILABLE = True
-        print("Using psycopg for PostgreSQL connection")
-    except ImportError:
-        PSYCOPG_AVAILABLE = False
-        print("Neither psycopg2 nor psycopg available")
-
-app = Flask(__name__)
-CORS(app)
-
-# Database configuration
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'dbname': os.getenv('DB_NAME', 'campaign_metadata'),
-    'user': os.getenv('DB_USER', 'postgres'),
-    'password': os.getenv('DB_PASSWORD', 'password'),
-    'port': os.getenv('DB_PORT', '5432')
-}
+    BROTLI_AVAILABLE = False
+
+# pyarrow is optional; only the Arrow export endpoints need it
+try:
+    import pyarrow as pa
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
 
+# gevent is optional; only the gevent worker profile needs it
+try:
+    from gevent import monkey as gevent_monkey
+    from gevent.socket import wait_read, wait_write
+    GEVENT_AVAILABLE = True
+except ImportError:
+    GEVENT_AVAILABLE = False
 
-def get_db_connection():
-    """Get database connection"""
-    if not PSYCOPG_AVAILABLE:
-        raise Exception("psycopg2 not available")
+# Every route lives on this blueprint; create_app builds the app around it
+bp = Blueprint('dashboard', __name__)
 
-    try:
-        # Handle both psycopg2 (uses 'database') and psycopg (uses 'dbname')
-        config = DB_CONFIG.copy()
+# Brand inventory tables and their brand codes
+BRAND_TABLES = [
+    ('aa_inventory', 'AA'),
+    ('bob_inventory', 'BG'),
+    ('cfo_inventory', 'CFO'),
+    ('gt_inventory', 'GT'),
+    ('hrd_inventory', 'HRD'),
+]
 
-        # Check which library we're actually using
-        try:
-            import psycopg2
-            # If we can import psycopg2 directly, check if it's actually
-            # psycopg2 or psycopg aliased
-            try:
-                if hasattr(psycopg2, '__version__'):
-                    # Real psycopg2 - needs 'database'
-                    if 'dbname' in config:
-                        config['database'] = config.pop('dbname')
-            except:
-                pass
-        except:
-            pass
+# Status values counted as "on hold" in summaries
+HOLD_STATUSES = ('Hold', 'Hold ', 'hold', 'On hold')
+
+# Materialized view holding the latest version of every slot, owned and
+# refreshed by this app
+LATEST_SLOTS_VIEW = 'campaign_metadata.latest_inventory_slots'
+LATEST_SLOTS_META_TABLE = 'campaign_metadata.latest_inventory_slots_meta'
+LATEST_SLOTS_LOCK_ID = 728104
 
-        conn = psycopg2.connect(**config)
-        print("Database connection successful!")
-        return conn
+# Refresh / aggregate settings (seconds)
+LATEST_SLOTS_REFRESH_INTERVAL = int(
+    os.getenv('LATEST_SLOTS_REFRESH_INTERVAL', '60'))
+INCREMENTAL_AGGREGATES = os.getenv('INCREMENTAL_AGGREGATES', 'true').lower() != 'false'
+AGGREGATE_REFRESH_INTERVAL = int(os.getenv('AGGREGATE_REFRESH_INTERVAL', '15'))
+AGGREGATE_FULL_RESYNC_INTERVAL = int(
+    os.getenv('AGGREGATE_FULL_RESYNC_INTERVAL', '3600'))
+ROLLUP_CACHE_MAX_ENTRIES = int(os.getenv('ROLLUP_CACHE_MAX_ENTRIES', '64'))
+
+# Delta sync: deleted slots remembered for the changes feed, and the
+# largest number of changed slots returned by one changes request
+TOMBSTONE_LOG_SIZE = int(os.getenv('TOMBSTONE_LOG_SIZE', '10000'))
+CHANGES_MAX_ROWS = int(os.getenv('CHANGES_MAX_ROWS', '5000'))
+
+
+# Read replicas: dashboard reads go to a replica from DB_REPLICA_URLS that
+# is no more than REPLICA_MAX_LAG seconds behind, otherwise to the primary
+DB_REPLICA_URLS = [url.strip() for url in os.getenv('DB_REPLICA_URLS', '').split(',') if url.strip()]
+REPLICA_MAX_LAG = float(os.getenv('REPLICA_MAX_LAG', '30'))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv('REPLICA_LAG_CHECK_INTERVAL', '10'))
+PRIMARY = 'primary'
+
+
+def _connect():
+    """Open a new connection to the primary database"""
+    try:
+        return db_driver.connect()
     except Exception as e:
         print(f"Database connection error: {e}")
-        # Try with alternative parameter name if first attempt fails
+        raise
+
+
+def make_driver_cooperative():
+    """Make Postgres waits yield to other greenlets under gevent.
+
+    Only applies when gevent has already patched the process, as the gevent
+    worker does before importing the app. The locks, events and queues below
+    are then created from the patched threading module, so the pool and the
+    caches block greenlets rather than the whole worker.
+    """
+    if not (GEVENT_AVAILABLE and gevent_monkey.is_module_patched('socket')):
+        return False
+    if not gevent_monkey.is_module_patched('threading'):
+        print("WARNING: gevent patched sockets but not threading; locks will block the worker")
+    db_driver.make_cooperative(wait_read, wait_write)
+    return True
+
+
+GEVENT_MODE = make_driver_cooperative()
+
+
+def _connect_replica(url):
+    """Open a new connection to a read replica"""
+    return db_driver.connect(url, connect_timeout=5)
+
+
+# Connection pool: idle connections are kept for reuse, up to DB_POOL_SIZE
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_POOL_CHECK_AFTER = int(os.getenv('DB_POOL_CHECK_AFTER', '30'))
+
+_connection_lock = threading.Lock()
+_connection_pool = {}      # target -> [(conn, returned_at)]
+# conn -> target (PRIMARY or a replica URL); weak so it never keeps a
+# connection, or its server session, alive on its own
+_connection_targets = weakref.WeakKeyDictionary()
+_pool_stats = {'in_use': 0, 'created': 0, 'reused': 0, 'discarded': 0}
+
+
+def _idle_connection(target):
+    """Take a live idle connection for target from the pool, or None"""
+    while True:
+        with _connection_lock:
+            idle = _connection_pool.get(target)
+            if not idle:
+                return None
+            conn, returned_at = idle.pop()
+
+        # Only test connections that sat idle long enough to have gone stale
+        if time.time() - returned_at <= DB_POOL_CHECK_AFTER:
+            return conn
         try:
-            config = DB_CONFIG.copy()
-            if 'database' in config:
-                config['dbname'] = config.pop('database')
-            elif 'dbname' in config:
-                config['database'] = config.pop('dbname')
-            conn = psycopg2.connect(**config)
-            print("Database connection successful (retry)!")
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            conn.rollback()
             return conn
-        except Exception as e2:
-            print(f"Database connection retry also failed: {e2}")
-        raise e
+        except Exception as e:
+            print(f"Discarding dead pooled connection: {e}")
+            _discard_connection(conn)
+
+
+def get_db_connection(role=None):
+    """Get a database connection, reusing an idle pooled one if possible.
+
+    role is 'primary' or 'replica'; by default requests read from replicas
+    (see db_role) and background jobs use the primary. Hand the connection
+    back with return_db_connection when done. Connections taken during a
+    request are watched so the query can be canceled if the client goes
+    away or the deadline passes.
+    """
+    target = database_target(role)
+    conn = _idle_connection(target)
+    created = conn is None
+    if created:
+        try:
+            conn = _connect() if target == PRIMARY else _connect_replica(target)
+        except Exception as e:
+            if target == PRIMARY:
+                raise
+            # Unreachable replica: stop using it until the next lag check
+            _record_replica_state(target, None, str(e))
+            target = PRIMARY
+            conn = _idle_connection(PRIMARY)
+            created = conn is None
+            if created:
+                conn = _connect()
+
+    # The one place a checkout is counted
+    with _connection_lock:
+        _pool_stats['in_use'] += 1
+        _pool_stats['created' if created else 'reused'] += 1
+        if created:
+            _connection_targets[conn] = target
+
+    if has_request_context():
+        g.db_target = 'replica' if target != PRIMARY else PRIMARY
+    watch_connection(conn)
+    return conn
+
+
+def _discard_connection(conn):
+    with _connection_lock:
+        _pool_stats['discarded'] += 1
+        _connection_targets.pop(conn, None)
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+def return_db_connection(conn):
+    """Return a connection to the pool, resetting its session state"""
+    unwatch_connection(conn)
+    with _connection_lock:
+        _pool_stats['in_use'] -= 1
+
+    if conn.closed:
+        _discard_connection(conn)
+        return
+    try:
+        # Ends any open transaction, and with it SET LOCAL settings
+        conn.rollback()
+        conn.autocommit = False
+    except Exception as e:
+        print(f"Discarding broken connection: {e}")
+        _discard_connection(conn)
+        return
+
+    with _connection_lock:
+        idle = _connection_pool.setdefault(_connection_targets.get(conn, PRIMARY), [])
+        if len(idle) < DB_POOL_SIZE:
+            idle.append((conn, time.time()))
+            return
+    _discard_connection(conn)
+
+
+@contextlib.contextmanager
+def db_connection(role=None):
+    """get_db_connection for a with block; the connection goes back however it exits"""
+    conn = get_db_connection(role)
+    try:
+        yield conn
+    finally:
+        return_db_connection(conn)
+
+
+def pool_status():
+    """Snapshot of pool usage"""
+    with _connection_lock:
+        idle = sum(len(conns) for conns in _connection_pool.values())
+        return dict(_pool_stats, idle=idle, size=DB_POOL_SIZE)
+
+
+# Replica lag: checked in the background, read on every connection checkout
+REPLICA_LAG_QUERY = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+_replica_lock = threading.Lock()
+_replica_state = {}   # replica URL -> {'lag', 'usable', 'error', 'checked_at'}
+_replica_monitor = {'thread': None, 'next': 0}
+
+
+def describe_dsn(dsn):
+    """host:port/dbname of a connection URL, without credentials"""
+    parsed = urlparse(dsn)
+    return f"{parsed.hostname}:{parsed.port or 5432}{parsed.path}"
+
+
+def db_role(role):
+    """Route a view's queries to the 'primary' or to the replicas"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            g.db_role = role
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def database_target(role=None):
+    """Pick the server for a role: a replica within the lag bound, else the primary"""
+    if role is None:
+        role = g.get('db_role', 'replica') if has_request_context() else PRIMARY
+    if role == PRIMARY or not DB_REPLICA_URLS:
+        return PRIMARY
+    with _replica_lock:
+        usable = [url for url in DB_REPLICA_URLS
+                  if _replica_state.get(url, {}).get('usable')]
+        if not usable:
+            return PRIMARY
+        _replica_monitor['next'] += 1
+        return usable[_replica_monitor['next'] % len(usable)]
+
+
+def _record_replica_state(url, lag, error=None):
+    usable = error is None and lag <= REPLICA_MAX_LAG
+    with _replica_lock:
+        previous = _replica_state.get(url)
+        _replica_state[url] = {'lag': lag, 'usable': usable, 'error': error,
+                               'checked_at': time.time()}
+    if previous is None or previous['usable'] != usable:
+        if usable:
+            print(f"Replica {describe_dsn(url)} in use (lag {lag:.1f}s)")
+        elif error:
+            print(f"Replica {describe_dsn(url)} unavailable, reading from primary: {error}")
+        else:
+            print(f"Replica {describe_dsn(url)} is {lag:.1f}s behind "
+                  f"(limit {REPLICA_MAX_LAG:g}s), reading from primary")
+
+
+def check_replica_lag(url):
+    """Measure how far a replica's replay is behind and record it"""
+    conn = None
+    try:
+        conn = _connect_replica(url)
+        cursor = conn.cursor()
+        cursor.execute(REPLICA_LAG_QUERY)
+        lag = float(cursor.fetchone()[0])
+        cursor.close()
+    except Exception as e:
+        _record_replica_state(url, None, str(e))
+        return
+    finally:
+        if conn is not None:
+            conn.close()
+    _record_replica_state(url, lag)
+
+
+def replica_status():
+    """Snapshot of the replicas' last lag checks"""
+    with _replica_lock:
+        return {describe_dsn(url): dict(_replica_state.get(url, {'usable': False}))
+                for url in DB_REPLICA_URLS}
+
+
+def _replica_lag_monitor():
+    """Background loop re-checking replica lag"""
+    while True:
+        for url in DB_REPLICA_URLS:
+            check_replica_lag(url)
+        time.sleep(REPLICA_LAG_CHECK_INTERVAL)
+
+
+def _start_replica_monitor():
+    with _replica_lock:
+        if DB_REPLICA_URLS and _replica_monitor['thread'] is None:
+            thread = threading.Thread(
+                target=_replica_lag_monitor, name='replica-lag', daemon=True)
+            thread.start()
+            _replica_monitor['thread'] = thread
+
+
+# Query watchdog: cancels the running statement of requests whose client
+# disconnected or whose deadline passed
+CANCEL_CHECK_INTERVAL = float(os.getenv('CANCEL_CHECK_INTERVAL', '0.5'))
+
+_watch_lock = threading.Lock()
+_watched_requests = {}   # id -> {'conns', 'socket', 'deadline', 'canceled'}
+_cancels_in_flight = {}  # connection -> Event set once its cancel request is done
+_watchdog = {'thread': None}
+
+
+def _request_watch():
+    """The current request's watch entry, created on first use"""
+    if not has_request_context():
+        return None
+    watch = g.get('query_watch')
+    if watch is None:
+        watch = {
+            'conns': {},     # connection -> token of this checkout
+            'socket': request.environ.get('gunicorn.socket'),
+            'deadline': g.get('deadline'),
+            'canceled': None,
+        }
+        g.query_watch = watch
+        with _watch_lock:
+            _watched_requests[id(watch)] = watch
+        _start_watchdog()
+    return watch
+
+
+def watch_connection(conn):
+    watch = _request_watch()
+    if watch is not None:
+        with _watch_lock:
+            watch['conns'][conn] = object()
+
+
+def unwatch_connection(conn):
+    """Stop watching conn; waits out a cancel already sent for it, so the
+    cancel cannot land on whoever checks the connection out next"""
+    watch = g.get('query_watch') if has_request_context() else None
+    if watch is not None:
+        with _watch_lock:
+            watch['conns'].pop(conn, None)
+            canceling = _cancels_in_flight.get(conn)
+        if canceling is not None:
+            canceling.wait()
+
+
+def query_cancel_reason():
+    """Why the current request's queries were canceled, or None"""
+    watch = g.get('query_watch') if has_request_context() else None
+    return watch['canceled'] if watch else None
+
+
+def _client_disconnected(sock):
+    """Peek at the client socket: a clean EOF means the client hung up"""
+    if sock is None:
+        return False
+    try:
+        # Check readability first: gevent sockets wait on EWOULDBLOCK
+        # instead of raising it, even with MSG_DONTWAIT
+        readable, _, _ = select.select([sock], [], [], 0)
+        if not readable:
+            return False
+        return sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT) == b''
+    except (BlockingIOError, InterruptedError):
+        return False
+    except OSError:
+        return True
+
+
+def _query_watchdog():
+    """Background loop canceling queries nobody is waiting for anymore"""
+    while True:
+        time.sleep(CANCEL_CHECK_INTERVAL)
+        now = time.time()
+        with _watch_lock:
+            watches = [(w, list(w['conns'].items())) for w in _watched_requests.values()
+                       if w['conns'] and not w['canceled']]
+        for watch, checkouts in watches:
+            if _client_disconnected(watch['socket']):
+                reason = 'disconnected'
+            elif watch['deadline'] is not None and now > watch['deadline']:
+                reason = 'deadline'
+            else:
+                continue
+            watch['canceled'] = reason
+            canceled = 0
+            for conn, token in checkouts:
+                # Marked under the lock only while the same checkout is
+                # still watched; the cancel itself is a network round trip
+                # and runs outside it. unwatch_connection waits for it, so
+                # a returned connection is never canceled under a new owner
+                with _watch_lock:
+                    if watch['conns'].get(conn) is not token:
+                        continue
+                    done = threading.Event()
+                    _cancels_in_flight[conn] = done
+                try:
+                    db_driver.cancel(conn)
+                    canceled += 1
+                except Exception as e:
+                    print(f"Error canceling query: {e}")
+                finally:
+                    with _watch_lock:
+                        _cancels_in_flight.pop(conn, None)
+                    done.set()
+            print(f"Canceled {canceled} running queries ({reason})")
+
+
+def _start_watchdog():
+    with _watch_lock:
+        if _watchdog['thread'] is None:
+            thread = threading.Thread(target=_query_watchdog, name='query-watchdog', daemon=True)
+            thread.start()
+            _watchdog['thread'] = thread
+
+
+@bp.teardown_app_request
+def forget_request_watch(error=None):
+    watch = g.get('query_watch')
+    if watch is not None:
+        with _watch_lock:
+            _watched_requests.pop(id(watch), None)
 
 
 def create_cursor(conn):
@@ -81,6 +488,74 @@ def create_cursor(conn):
     return conn.cursor()
 
 
+# Statement registry: each (endpoint, brand table, filter shape) query is
+# composed once, prepared once per pooled connection and then executed
+# with bound parameters only
+PREPARED_STATEMENTS = os.getenv('PREPARED_STATEMENTS', 'true').lower() != 'false'
+
+_statement_lock = threading.Lock()
+_statements = {}    # (endpoint, table, shape) -> statement
+
+
+def brand_table_identifier(table):
+    """campaign_metadata.<table> as a quoted identifier"""
+    return sql.Identifier('campaign_metadata', table)
+
+
+def registered_statement(endpoint, table, shape, build):
+    """The statement for one query shape, composing it with build() on first use.
+
+    shape holds whatever changes the SQL text (view readiness, which filters
+    are present); values never go in the text, only %s placeholders.
+    """
+    key = (endpoint, table, shape)
+    statement = _statements.get(key)
+    if statement is None:
+        composed = build()
+        with _statement_lock:
+            statement = _statements.get(key)
+            if statement is None:
+                statement = {
+                    'key': key,
+                    'name': f'dashboard_{len(_statements) + 1}',
+                    'composed': composed,
+                    'text': None if SQL_NEEDS_CONNECTION else composed.as_string(None),
+                }
+                _statements[key] = statement
+    return statement
+
+
+def statement_text(statement, context=None):
+    """SQL text of a registered statement, with %s placeholders"""
+    if statement['text'] is None:
+        statement['text'] = statement['composed'].as_string(context)
+    return statement['text']
+
+
+def execute_statement(cursor, statement, params=(), timed=True):
+    """Execute a registered statement on a cursor.
+
+    The statement is prepared once per connection under its registered
+    name (see db_driver.execute). The run time is recorded under the
+    current execution profile.
+    """
+    started = time.time()
+    try:
+        db_driver.execute(cursor, statement_text(statement, cursor), tuple(params),
+                          prepare=statement['name'] if PREPARED_STATEMENTS else None)
+    finally:
+        if timed:
+            record_query_timing(current_execution_profile(), statement['key'][0],
+                                time.time() - started)
+
+
+def statement_registry_status():
+    """Registered statement count and connections holding prepared ones"""
+    with _statement_lock:
+        count = len(_statements)
+    return {'statements': count, 'prepared_connections': db_driver.prepared_connection_count()}
+
+
 def detect_date_format(sample_dates):
     """Detect date format from sample dates"""
     if not sample_dates:
@@ -112,11 +587,7 @@ def detect_date_format(sample_dates):
 
 def get_sample_dates_from_db(table_name, limit=10):
     """Get sample dates from database to detect format"""
-    try:
-        conn = get_db_connection()
-        cursor = create_cursor(conn)
-    
-        query = f"""
+    query = f"""
         SELECT DISTINCT "Dates"
         FROM campaign_metadata.{table_name}
         WHERE "Dates" IS NOT NULL
@@ -124,15 +595,13 @@ def get_sample_dates_from_db(table_name, limit=10):
         AND "Dates" LIKE '%, %%, %'
         LIMIT %s
         """
-
-        cursor.execute(query, (limit,))
-        results = cursor.fetchall()
-        sample_dates = [row[0] for row in results]
-
-        cursor.close()
-        conn.close()
-
-        return sample_dates
+    try:
+        with db_connection() as conn:
+            cursor = create_cursor(conn)
+            cursor.execute(query, (limit,))
+            results = cursor.fetchall()
+            cursor.close()
+        return [row[0] for row in results]
     except Exception as e:
         print(f"Error getting sample dates from {table_name}: {e}")
         return []
@@ -202,330 +671,2362 @@ def safe_date_parsing(date_string, formats):
     return False
 
 
-def get_inventory_summary(start_date=None, end_date=None):
-    """Get summary statistics for inventory with optional date filtering"""
-    try:
-        conn = get_db_connection()
-        cursor = create_cursor(conn)
-        
-        # Define brand tables
-        brand_tables = [
-            ('aa_inventory', 'AA'),
-            ('bob_inventory', 'BG'),
-            ('cfo_inventory', 'CFO'),
-            ('gt_inventory', 'GT'),
-            ('hrd_inventory', 'HRD'),
-        ]
-        
-        summary = {
-            'total_slots': 0,
-            'booked': 0,
-            'available': 0,
-            'on_hold': 0,
-            'by_brand': {}
-        }
-
-        for table, brand_code in brand_tables:
-            # Build base query with duplicate handling
-            base_query = f"""
-            WITH latest_slots AS (
-                SELECT DISTINCT ON ("ID") *
-                FROM campaign_metadata.{table}
-                WHERE "ID" >= 8000
-                ORDER BY "ID", last_updated DESC
-            )
-            SELECT
-                COUNT(*) as total,
-                COUNT(CASE WHEN "Booked/Not Booked" = 'Booked' THEN 1 END) as booked,
-                COUNT(CASE WHEN "Booked/Not Booked" = 'Not Booked' THEN 1 END) as available,
-                COUNT(CASE WHEN "Booked/Not Booked" IN ('Hold', 'Hold ', 'hold', 'On hold') THEN 1 END) as on_hold
-            FROM latest_slots
-            """
-
-            # Add date filtering if provided
-            if start_date and end_date:
-                # Use dynamic date filtering
-                date_filter = build_date_filtered_query(
-                    table, start_date, end_date)
-                query = base_query + date_filter
-                print(f"DEBUG: Query with date filter for {table}: {query}")
-            else:
-                # No date filtering
-                query = base_query
-                print(f"DEBUG: Query without date filter for {table}: {query}")
-
-            try:
-                cursor.execute(query)
-                result = cursor.fetchone()
-                if result:
-                    brand_total = result[0]
-                    brand_booked = result[1]
-                    brand_available = result[2]
-                    brand_on_hold = result[3]
-
-                    summary['total_slots'] += brand_total
-                    summary['booked'] += brand_booked
-                    summary['available'] += brand_available
-                    summary['on_hold'] += brand_on_hold
-
-                    summary['by_brand'][brand_code] = {
-                        'total': brand_total,
-                        'booked': brand_booked,
-                        'available': brand_available,
-                        'on_hold': brand_on_hold,
-                        'percentage': round(
-                            (brand_booked / brand_total *
-                             100) if brand_total > 0 else 0,
-                            1)
-                    }
-            except Exception as e:
-                print(f"Error getting summary for {table}: {e}")
-                continue
-        
-        cursor.close()
-        conn.close()
+# Running aggregates of the latest slot versions, keyed by
+# (brand, product, slot date, status). Only rows whose last_updated is at or
+# past the per-brand watermark are read on each refresh, so the refresh cost
+# follows the change rate rather than the table size. A periodic full resync
+# picks up deleted rows, which never show up as changes.
+_aggregate_lock = threading.Lock()
+_aggregate_refresh_lock = threading.Lock()
+_rollup_cache = {}   # (start_date, end_date) -> (fetched_at, rollup)
+_rollup_cache_lock = threading.Lock()
+_aggregate_state = {
+    'slots': {},        # brand_code -> {slot ID: (product, slot_date, status)}
+    'counts': {},       # (brand_code, product, slot_date, status) -> count
+    'watermarks': {},   # brand_code -> latest last_updated applied
+    'tombstones': deque(maxlen=TOMBSTONE_LOG_SIZE),  # (seq, watermark, brand_code, slot ID)
+    'tombstone_seq': 0,  # sequence number of the latest tombstone
+    'brand_errors': {},  # brand_code -> why its last refresh failed
+    'loaded': False,
+    'refreshed_at': None,
+    'last_refresh': 0,
+    'last_full_sync': 0,
+}
 
-        return summary
-        
-    except Exception as e:
-        print(f"Error getting inventory summary: {e}")
-        return {
-            'total_slots': 0,
-            'booked': 0,
-            'available': 0,
-            'on_hold': 0,
-            'by_brand': {}
-        }
 
+def _apply_slot_version(brand_code, slot_id, key):
+    """Replace the previous latest version of a slot with a new one"""
+    slots = _aggregate_state['slots'].setdefault(brand_code, {})
+    counts = _aggregate_state['counts']
 
-def get_form_submissions_for_week(start_date, end_date):
-    """Get form submissions count for each brand for the given week from data_products.sponsorship_bookings_form_submissions"""
-    try:
-        conn = get_db_connection()
-        cursor = create_cursor(conn)
-        # Query the real form submissions table
-        cursor.execute("""
-        SELECT 
-                brand,
-                COUNT(*) as form_count
-            FROM data_products.sponsorship_bookings_form_submissions
-            WHERE submit_timestamp >= %s
-            AND submit_timestamp <= %s
-            AND brand IN ('AA', 'BG', 'CFO', 'GT', 'HRD')
-            GROUP BY brand
-        """, (start_date, end_date))
+    previous = slots.get(slot_id)
+    if previous == key:
+        return
 
-        results = cursor.fetchall()
-        form_submissions = {}
-        
-        for row in results:
-            form_submissions[row[0]] = row[1]
+    if previous is not None:
+        previous_key = (brand_code,) + previous
+        counts[previous_key] -= 1
+        if counts[previous_key] <= 0:
+            del counts[previous_key]
 
-        print(
-            f"Found form submissions from data_products.sponsorship_bookings_form_submissions: {form_submissions}")
+    slots[slot_id] = key
+    new_key = (brand_code,) + key
+    counts[new_key] = counts.get(new_key, 0) + 1
 
-        cursor.close()
-        conn.close()
 
-        # Ensure all brands have a value (default to 0 if not found)
-        for brand_code in ['AA', 'BG', 'CFO', 'GT', 'HRD']:
-            if brand_code not in form_submissions:
-                form_submissions[brand_code] = 0
+def _fetch_slot_changes(cursor, table, brand_code, watermark=None):
+    """Fetch the latest version of every slot changed since the watermark"""
+    if watermark is None and _latest_slots_view['ready']:
+        # Full loads read the materialized view; deltas read the live table
+        # so nothing changed since the last view refresh is missed.
+        statement = registered_statement('slot_changes', None, (), lambda: sql.SQL("""
+        SELECT "ID", "Product", "Dates", "Booked/Not Booked", last_updated
+        FROM {view}
+        WHERE brand = %s
+        """).format(view=sql.Identifier(*LATEST_SLOTS_VIEW.split('.'))))
+        execute_statement(cursor, statement, (brand_code,))
+        return cursor.fetchall()
 
-        print(
-            f"Final form submissions for week {start_date} to {end_date}: {form_submissions}")
-        return form_submissions
+    def build():
+        query = sql.SQL("""
+    SELECT DISTINCT ON ("ID")
+        "ID", "Product", "Dates", "Booked/Not Booked", last_updated
+    FROM {table}
+    WHERE "ID" >= 8000
+    """).format(table=brand_table_identifier(table))
+        if watermark is not None:
+            query += sql.SQL(' AND last_updated >= %s')
+        return query + sql.SQL(' ORDER BY "ID", last_updated DESC')
 
-    except Exception as e:
-        print(
-            f"Error getting form submissions from data_products.sponsorship_bookings_form_submissions: {e}")
-        # Return mock data as fallback
-        return {
-            'AA': 12,
-            'BG': 8,
-            'CFO': 15,
-            'GT': 6,
-            'HRD': 9,
-        }
+    statement = registered_statement('slot_changes', table, (watermark is not None,), build)
+    execute_statement(cursor, statement, () if watermark is None else (watermark,))
+    return cursor.fetchall()
 
 
-@app.route('/')
-def index():
-    """Serve the main dashboard"""
-    try:
-        with open('index.html', 'r') as f:
-            content = f.read()
-        return content
-    except FileNotFoundError:
-        return "Dashboard file not found", 404
+def refresh_inventory_aggregates(force_full=False):
+    """Bring the running aggregates up to date with the brand tables"""
+    now = time.time()
+    if (not force_full and _aggregate_state['loaded'] and
+            now - _aggregate_state['last_refresh'] < AGGREGATE_REFRESH_INTERVAL):
+        return
 
+    # Only one refresh at a time; readers keep using the current state
+    # unless nothing has been loaded yet.
+    blocking = not _aggregate_state['loaded']
+    if not _aggregate_refresh_lock.acquire(blocking=blocking):
+        return
 
-@app.route('/api/inventory')
-def api_inventory():
-    """API endpoint for inventory data with filtering"""
     try:
-        # Get query parameters
-        limit = request.args.get('limit', 100, type=int)
-        brand = request.args.get('brand')
-        status = request.args.get('status')
-        client = request.args.get('client')
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
+        if (not force_full and _aggregate_state['loaded'] and
+                time.time() - _aggregate_state['last_refresh'] < AGGREGATE_REFRESH_INTERVAL):
+            # Loaded by the refresh we were waiting on
+            return
 
-        print(f"DEBUG: Inventory API called with params: limit={limit}, brand={brand}, status={status}, client={client}, start_date={start_date}, end_date={end_date}")
+        full_sync = (force_full or not _aggregate_state['loaded'] or
+                     now - _aggregate_state['last_full_sync'] >= AGGREGATE_FULL_RESYNC_INTERVAL)
 
         conn = get_db_connection()
         cursor = create_cursor(conn)
-        print(f"DEBUG: Database connection established")
-
-        # Define brand tables
-        brand_tables = [
-            ('aa_inventory', 'AA'),
-            ('bob_inventory', 'BG'),
-            ('cfo_inventory', 'CFO'),
-            ('gt_inventory', 'GT'),
-            ('hrd_inventory', 'HRD'),
-        ]
+        changed = 0
+        try:
+            for table, brand_code in BRAND_TABLES:
+                if query_cancel_reason():
+                    # The request driving this refresh is gone; the next one resumes
+                    break
+                watermark = None if full_sync else _aggregate_state['watermarks'].get(brand_code)
+                try:
+                    apply_execution_profile(cursor)
+                    rows = _fetch_slot_changes(cursor, table, brand_code, watermark)
+                except DeadlineExceeded:
+                    _aggregate_state['brand_errors'][brand_code] = 'timeout'
+                    continue
+                except Exception as e:
+                    print(f"Error refreshing aggregates for {table}: {e}")
+                    _aggregate_state['brand_errors'][brand_code] = (
+                        'timeout' if is_query_canceled(e) else 'error')
+                    conn.rollback()
+                    continue
+                _aggregate_state['brand_errors'].pop(brand_code, None)
 
-        all_slots = []
-        print(f"DEBUG: Starting to process {len(brand_tables)} brand tables")
+                with _aggregate_lock:
+                    previous_ids = None
+                    if full_sync:
+                        # Drop the brand's slots so deleted rows fall out
+                        if _aggregate_state['loaded']:
+                            previous_ids = set(_aggregate_state['slots'].get(brand_code, {}))
+                        _aggregate_state['slots'][brand_code] = {}
+                        counts = _aggregate_state['counts']
+                        for key in [k for k in counts if k[0] == brand_code]:
+                            del counts[key]
 
-        for table, brand_code in brand_tables:
-            print(f"DEBUG: Processing table {table} with brand_code {brand_code}")
-            # Skip if brand filter is specified and doesn't match
-            if brand and brand != brand_code:
-                continue
+                    brand_watermark = watermark
+                    for slot_id, product, slot_date, status, last_updated in rows:
+                        _apply_slot_version(
+                            brand_code, slot_id, (product, slot_date, status))
+                        if last_updated and (brand_watermark is None or last_updated > brand_watermark):
+                            brand_watermark = last_updated
 
-            # Build query WITH JOIN to get client names
-            base_query = f"""
-            WITH latest_slots AS (
-                SELECT DISTINCT ON ("Booking ID") *
-                FROM campaign_metadata.{table}
-                WHERE "ID" >= 8000
-                AND "Booking ID" IS NOT NULL
-                AND "Booking ID" != ''
-                ORDER BY "Booking ID", last_updated DESC
-            )
-            SELECT DISTINCT ON (inv."Booking ID")
-                inv."ID",
-                inv."Website_Name",
-                inv."Booked/Not Booked",
-                inv."Dates",
-                COALESCE(cl."Client Name", 'No Client') as "Client",
-                inv."Booking ID",
-                inv."Media_Asset" as "Product",
-                NULL as "Price",
-                inv."last_updated"
-            FROM latest_slots inv
-            LEFT JOIN campaign_metadata.campaign_ledger cl 
-                ON inv."Booking ID" = cl."Booking ID" 
-                AND cl."Brand" = '{brand_code}'
-            WHERE 1=1
-            """
+                    if previous_ids:
+                        # Slots gone from the table become tombstones for the
+                        # changes feed, stamped no earlier than anything a
+                        # client could already have seen
+                        seen = [brand_watermark] + list(_aggregate_state['watermarks'].values())
+                        recorded = max((w for w in seen if w is not None), default=None)
+                        for slot_id in previous_ids.difference(_aggregate_state['slots'][brand_code]):
+                            _aggregate_state['tombstone_seq'] += 1
+                            _aggregate_state['tombstones'].append(
+                                (_aggregate_state['tombstone_seq'], recorded, brand_code, slot_id))
 
-            params = []  # Start with empty params, add filters as needed
+                    _aggregate_state['watermarks'][brand_code] = brand_watermark
+                changed += len(rows)
+        finally:
+            cursor.close()
+            return_db_connection(conn)
 
-            # Add status filter
-            if status:
-                # Map frontend status to database values
-                status_map = {
-                    'Booked': 'Booked',
-                    'Available': 'Not Booked',
-                    'On Hold': 'Hold'
-                }
-                db_status = status_map.get(status, status)
-                base_query += ' AND inv."Booked/Not Booked" = %s'
-                params.append(db_status)
-
-            # Add client filter
-            if client:
-                base_query += ' AND cl."Client Name" ILIKE %s'
-                params.append(f'%{client}%')
-
-            # Add product filter
-            product = request.args.get('product')
-            if product:
-                base_query += ' AND inv."Media_Asset" = %s'
-                params.append(product)
-
-            # Add date filter
-            if start_date and end_date:
-                date_filter = build_date_filtered_query(
-                    table, start_date, end_date, use_alias=True)
-                if date_filter:  # Only add if date_filter is not empty
-                    base_query += date_filter
-
-            # Add LIMIT per table to prevent timeout
-            # Order by Booking ID and last_updated to ensure DISTINCT ON works correctly
-            base_query += ' ORDER BY inv."Booking ID", inv."last_updated" DESC LIMIT 1000'
+        with _aggregate_lock:
+            _aggregate_state['loaded'] = True
+            _aggregate_state['last_refresh'] = now
+            _aggregate_state['refreshed_at'] = datetime.now(timezone.utc)
+            if full_sync:
+                _aggregate_state['last_full_sync'] = now
 
-            try:
-                print(f"DEBUG: Starting query for {table} (brand: {brand_code})")
-                print(f"DEBUG: Params: {params}")
-                print(f"DEBUG: Query length: {len(base_query)} chars")
-                print(f"DEBUG: Full query: {base_query}")
+        print(f"Aggregates refreshed ({'full' if full_sync else 'delta'}): {changed} slot versions applied")
+    finally:
+        _aggregate_refresh_lock.release()
 
-                # Test query execution
-                try:
-                    # Execute query - handle empty params
-                    if len(params) > 0:
-                        cursor.execute(base_query, tuple(params))
-                    else:
-                        cursor.execute(base_query)
-                    results = cursor.fetchall()
-                    print(f"DEBUG: Query executed successfully for {table}, got {len(results)} rows")
-                    if len(results) > 0:
-                        print(f"DEBUG: First row sample: {results[0]}")
-                except Exception as query_error:
-                    print(f"DEBUG: Query execution FAILED for {table}: {query_error}")
-                    import traceback
-                    print(f"DEBUG: Query error traceback: {traceback.format_exc()}")
-                    print(f"DEBUG: Query was: {base_query[:1000]}...")  # Print first 1000 chars
-                    # Rollback transaction on error to allow other queries to proceed
-                    conn.rollback()
-                    continue
 
-                if results:
-                    print(f"DEBUG: First result sample: {results[0]}")
-                else:
-                    print(f"DEBUG: No results returned from query for {table}")
-                    # Don't continue - this might be the issue, let's see what happens
-                    # Actually, continue is fine - we want to process all tables
-                    continue
+def _slot_dates_in_range(start_date, end_date):
+    """Return the "Dates" strings covered by a YYYY-MM-DD range"""
+    start_dt = datetime.strptime(start_date, '%Y-%m-%d')
+    end_dt = datetime.strptime(end_date, '%Y-%m-%d')
+
+    slot_dates = set()
+    current_date = start_dt
+    while current_date <= end_dt:
+        slot_dates.add(current_date.strftime('%A, %B %d, %Y'))
+        current_date += timedelta(days=1)
+    return slot_dates
+
+
+def _empty_counts():
+    return {'total': 0, 'booked': 0, 'available': 0, 'on_hold': 0}
+
+
+def _add_status_count(bucket, status, count):
+    """Add a (status, count) pair to a total/booked/available/on_hold bucket"""
+    bucket['total'] += count
+    if status == 'Booked':
+        bucket['booked'] += count
+    elif status == 'Not Booked':
+        bucket['available'] += count
+    elif status in HOLD_STATUSES:
+        bucket['on_hold'] += count
+
+
+def _counts_from_aggregates(start_date=None, end_date=None):
+    """Get grand, per-brand and per-product counts from the running aggregates"""
+    slot_dates = None
+    if start_date and end_date:
+        slot_dates = _slot_dates_in_range(start_date, end_date)
+
+    totals = _empty_counts()
+    by_brand = {brand_code: _empty_counts() for _, brand_code in BRAND_TABLES}
+    by_product = {brand_code: {} for _, brand_code in BRAND_TABLES}
+
+    with _aggregate_lock:
+        for (brand_code, product, slot_date, status), count in _aggregate_state['counts'].items():
+            if slot_dates is not None and slot_date not in slot_dates:
+                continue
+            _add_status_count(totals, status, count)
+            _add_status_count(by_brand[brand_code], status, count)
+            if product is not None:
+                product_counts = by_product[brand_code].setdefault(
+                    product, _empty_counts())
+                _add_status_count(product_counts, status, count)
+
+    return {'totals': totals, 'by_brand': by_brand, 'by_product': by_product}
+
+
+def unified_latest_slots_sql():
+    """SQL for the latest version of every slot across all brand tables"""
+    branches = []
+    for table, brand_code in BRAND_TABLES:
+        branches.append(f"""
+        (SELECT DISTINCT ON ("ID")
+            '{brand_code}' AS brand,
+            "ID",
+            "Website_Name",
+            "Booked/Not Booked",
+            "Dates",
+            "Booking ID",
+            "Media_Asset",
+            "Product",
+            last_updated
+        FROM campaign_metadata.{table}
+        WHERE "ID" >= 8000
+        ORDER BY "ID", last_updated DESC)""")
+    return '\n        UNION ALL'.join(branches)
+
+
+_latest_slots_view = {
+    'ready': False,
+    'refreshed_at': None,
+    'scheduler': None,
+}
+
+
+def latest_slots_sql(table=None, brand_code=None):
+    """SQL for the latest version of every slot, for one brand or all brands.
+
+    Reads the materialized view once it exists and falls back to
+    deduplicating the brand tables inline.
+    """
+    if _latest_slots_view['ready']:
+        if brand_code:
+            return f"SELECT * FROM {LATEST_SLOTS_VIEW} WHERE brand = '{brand_code}'"
+        return f"SELECT * FROM {LATEST_SLOTS_VIEW}"
+
+    if brand_code:
+        return f"""
+        SELECT DISTINCT ON ("ID") '{brand_code}' AS brand, *
+        FROM campaign_metadata.{table}
+        WHERE "ID" >= 8000
+        ORDER BY "ID", last_updated DESC"""
+    return unified_latest_slots_sql()
+
+
+def latest_slots_composable(table=None):
+    """latest_slots_sql as composable SQL.
+
+    For one brand table it takes the brand code as its only parameter
+    instead of having it written into the text.
+    """
+    if not table:
+        return sql.SQL(latest_slots_sql())
+    if _latest_slots_view['ready']:
+        return sql.SQL("SELECT * FROM {view} WHERE brand = %s").format(
+            view=sql.Identifier(*LATEST_SLOTS_VIEW.split('.')))
+    return sql.SQL("""
+        SELECT DISTINCT ON ("ID") %s::text AS brand, *
+        FROM {table}
+        WHERE "ID" >= 8000
+        ORDER BY "ID", last_updated DESC""").format(table=brand_table_identifier(table))
+
+
+def latest_slots_freshness():
+    """Return (source, refreshed_at) for data read through latest_slots_sql"""
+    if _latest_slots_view['ready']:
+        return 'latest_inventory_slots', _latest_slots_view['refreshed_at']
+    return 'live', None
+
+
+def ensure_latest_slots_view(cursor):
+    """Create the latest slots materialized view and its indexes if missing"""
+    # Serialize creation across workers
+    cursor.execute("SELECT pg_advisory_xact_lock(%s)", (LATEST_SLOTS_LOCK_ID,))
+    cursor.execute(f"""
+    CREATE MATERIALIZED VIEW IF NOT EXISTS {LATEST_SLOTS_VIEW} AS
+    {unified_latest_slots_sql()}
+    """)
+    # REFRESH ... CONCURRENTLY needs a unique index covering every row
+    cursor.execute(f"""
+    CREATE UNIQUE INDEX IF NOT EXISTS latest_inventory_slots_brand_id_idx
+    ON {LATEST_SLOTS_VIEW} (brand, "ID")
+    """)
+    cursor.execute(f"""
+    CREATE INDEX IF NOT EXISTS latest_inventory_slots_booking_id_idx
+    ON {LATEST_SLOTS_VIEW} ("Booking ID")
+    """)
+    cursor.execute(f"""
+    CREATE INDEX IF NOT EXISTS latest_inventory_slots_last_updated_idx
+    ON {LATEST_SLOTS_VIEW} (last_updated)
+    """)
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS {LATEST_SLOTS_META_TABLE} (
+        view_name TEXT PRIMARY KEY,
+        refreshed_at TIMESTAMPTZ NOT NULL
+    )
+    """)
+    cursor.execute(f"""
+    INSERT INTO {LATEST_SLOTS_META_TABLE} (view_name, refreshed_at)
+    VALUES ('latest_inventory_slots', now())
+    ON CONFLICT (view_name) DO NOTHING
+    """)
+
+
+def refresh_latest_slots_view():
+    """Refresh the latest slots view if it is due and record its freshness.
+
+    Every worker runs this on a schedule; an advisory lock makes sure only
+    one of them refreshes at a time, the rest just pick up the new
+    refreshed_at from the meta table.
+    """
+    conn = None
+    try:
+        conn = get_db_connection(PRIMARY)
+        cursor = create_cursor(conn)
+
+        if not _latest_slots_view['ready']:
+            ensure_latest_slots_view(cursor)
+            conn.commit()
+            _latest_slots_view['ready'] = True
+            print(f"Materialized view {LATEST_SLOTS_VIEW} is ready")
+
+        cursor.execute("SELECT pg_try_advisory_xact_lock(%s)", (LATEST_SLOTS_LOCK_ID,))
+        locked = cursor.fetchone()[0]
+
+        cursor.execute(f"""
+        SELECT refreshed_at, now() - refreshed_at
+        FROM {LATEST_SLOTS_META_TABLE}
+        WHERE view_name = 'latest_inventory_slots'
+        """)
+        refreshed_at, age = cursor.fetchone()
+
+        if locked and age.total_seconds() >= LATEST_SLOTS_REFRESH_INTERVAL:
+            started = time.time()
+            cursor.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {LATEST_SLOTS_VIEW}")
+            cursor.execute(f"""
+            UPDATE {LATEST_SLOTS_META_TABLE}
+            SET refreshed_at = now()
+            WHERE view_name = 'latest_inventory_slots'
+            RETURNING refreshed_at
+            """)
+            refreshed_at = cursor.fetchone()[0]
+            print(f"Refreshed {LATEST_SLOTS_VIEW} in {time.time() - started:.2f}s")
+
+        conn.commit()
+        cursor.close()
+        _latest_slots_view['refreshed_at'] = refreshed_at
+    except Exception as e:
+        print(f"Error refreshing {LATEST_SLOTS_VIEW}: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            return_db_connection(conn)
+
+
+def ensure_change_indexes():
+    """Index last_updated on every brand table so delta reads stay cheap.
+
+    Built CONCURRENTLY so the ETL can keep writing; the advisory lock keeps
+    workers from building the same index side by side. A concurrent build
+    that failed or was interrupted leaves an INVALID index behind, which
+    IF NOT EXISTS would keep skipping, so invalid ones are dropped and
+    built again.
+    """
+    conn = None
+    try:
+        conn = get_db_connection(PRIMARY)
+        conn.autocommit = True
+        cursor = create_cursor(conn)
+        cursor.execute("SELECT pg_advisory_lock(%s)", (LATEST_SLOTS_LOCK_ID + 1,))
+        try:
+            for table, _ in BRAND_TABLES:
+                index = f'{table}_last_updated_idx'
+                try:
+                    cursor.execute("""
+                    SELECT i.indisvalid
+                    FROM pg_index i
+                    JOIN pg_class c ON c.oid = i.indexrelid
+                    JOIN pg_namespace n ON n.oid = c.relnamespace
+                    WHERE n.nspname = 'campaign_metadata' AND c.relname = %s
+                    """, (index,))
+                    row = cursor.fetchone()
+                    if row and not row[0]:
+                        print(f"Rebuilding invalid index campaign_metadata.{index}")
+                        cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS campaign_metadata.{index}")
+                    cursor.execute(f"""
+                    CREATE INDEX CONCURRENTLY IF NOT EXISTS {index}
+                    ON campaign_metadata.{table} (last_updated)
+                    """)
+                except Exception as e:
+                    # One table failing leaves the others to be indexed
+                    print(f"Error creating index {index}: {e}")
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (LATEST_SLOTS_LOCK_ID + 1,))
+        cursor.close()
+    except Exception as e:
+        print(f"Error creating last_updated indexes: {e}")
+    finally:
+        if conn:
+            return_db_connection(conn)
+
+
+def _latest_slots_scheduler():
+    """Background loop keeping the latest slots view fresh"""
+    while True:
+        refresh_latest_slots_view()
+        time.sleep(LATEST_SLOTS_REFRESH_INTERVAL)
+
+
+def _aggregate_refresher():
+    """Background loop keeping the aggregates current.
+
+    Also what finds deleted slots for the changes feed, so feed requests
+    never refresh on their own.
+    """
+    while True:
+        try:
+            refresh_inventory_aggregates()
+        except Exception as e:
+            print(f"Error refreshing inventory aggregates: {e}")
+        time.sleep(AGGREGATE_REFRESH_INTERVAL)
+
+
+def start_background_jobs():
+    """Start the background refresh threads for this process"""
+    _start_replica_monitor()
+    if INCREMENTAL_AGGREGATES:
+        threading.Thread(
+            target=_aggregate_refresher, name='aggregate-refresh', daemon=True).start()
+    threading.Thread(target=ensure_change_indexes, name='change-indexes', daemon=True).start()
+    if LATEST_SLOTS_REFRESH_INTERVAL > 0 and _latest_slots_view['scheduler'] is None:
+        scheduler = threading.Thread(
+            target=_latest_slots_scheduler, name='latest-slots-refresh', daemon=True)
+        scheduler.start()
+        _latest_slots_view['scheduler'] = scheduler
+    if BOOTSTRAP_REFRESH_INTERVAL > 0:
+        threading.Thread(
+            target=_index_bootstrap_refresher, name='index-bootstrap', daemon=True).start()
+
+
+def note_data_freshness(source, refreshed_at):
+    """Record where the current request's data came from and how fresh it is"""
+    if has_request_context():
+        g.data_source = source
+        g.data_refreshed_at = refreshed_at
+
+
+@bp.after_app_request
+def add_freshness_headers(response):
+    """Expose data freshness metadata on API responses"""
+    source = g.get('data_source')
+    if source:
+        response.headers['X-Data-Source'] = source
+        refreshed_at = g.get('data_refreshed_at')
+        if refreshed_at:
+            age = datetime.now(timezone.utc) - refreshed_at
+            response.headers['X-Data-Refreshed-At'] = refreshed_at.isoformat()
+            response.headers['X-Data-Age-Seconds'] = str(int(age.total_seconds()))
+    target = g.get('db_target')
+    if target:
+        response.headers['X-Database'] = target
+    return response
+
+
+# Request deadlines: every API request gets a time budget and each query
+# runs with a statement_timeout matching what is left of it
+REQUEST_DEADLINE = float(os.getenv('REQUEST_DEADLINE', '15'))
+QUERY_CANCELED = '57014'
+
+
+class DeadlineExceeded(Exception):
+    """The request ran out of time before a query could start"""
+
+
+@bp.before_app_request
+def start_request_deadline():
+    """Start the request's budget; clients may ask for a shorter one"""
+    budget = REQUEST_DEADLINE
+    requested = request.headers.get('X-Request-Timeout')
+    if requested:
+        try:
+            budget = min(budget, float(requested))
+        except ValueError:
+            pass
+    g.deadline = time.time() + budget
+
+
+def remaining_time():
+    """Seconds left in the current request's budget, None outside requests"""
+    if not has_request_context() or g.get('deadline') is None:
+        return None
+    return g.deadline - time.time()
+
+
+# Execution profiles: planner and executor settings for each kind of query,
+# applied for the current transaction only. statement_timeout (ms, 0 for
+# none) caps the request deadline.
+EXECUTION_PROFILE_SETTINGS = ('work_mem', 'jit', 'max_parallel_workers_per_gather',
+                              'statement_timeout')
+EXECUTION_DEFAULT_PROFILES = {
+    # Short per-brand lookups: no JIT or parallel worker startup cost
+    'interactive': {'work_mem': '16MB', 'jit': 'off',
+                    'max_parallel_workers_per_gather': '0', 'statement_timeout': '10000'},
+    # DISTINCT ON sorts and GROUPING SETS over whole brand tables
+    'aggregate': {'work_mem': '64MB', 'jit': 'off',
+                  'max_parallel_workers_per_gather': '2', 'statement_timeout': '30000'},
+    # Full streamed exports; cursors do not run in parallel anyway
+    'export': {'work_mem': '128MB', 'jit': 'on',
+               'max_parallel_workers_per_gather': '0', 'statement_timeout': '0'},
+}
+QUERY_TIMING_SAMPLES = int(os.getenv('QUERY_TIMING_SAMPLES', '500'))
+
+
+def _execution_profiles():
+    profiles = {name: dict(settings) for name, settings in EXECUTION_DEFAULT_PROFILES.items()}
+    for item in os.getenv('EXECUTION_PROFILES', '').split(','):
+        key, _, value = item.strip().partition('=')
+        profile, _, setting = key.partition('.')
+        if not value:
+            continue
+        if profile not in profiles or setting not in EXECUTION_PROFILE_SETTINGS:
+            print(f"Ignoring invalid EXECUTION_PROFILES entry: {item}")
+            continue
+        profiles[profile][setting] = value
+    return profiles
+
+
+EXECUTION_PROFILES = _execution_profiles()
+
+
+def execution_profile(name):
+    """Run a view's queries under a named execution profile"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            g.execution_profile = name
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_execution_profile():
+    """The profile for the current request; background work aggregates"""
+    if has_request_context():
+        return g.get('execution_profile', 'interactive')
+    return 'aggregate'
+
+
+def execution_profile_statement(profile, remaining=None):
+    """The set_config statement applying a profile, and its parameters.
+
+    remaining is the request's budget in seconds, or None for no deadline;
+    the statement_timeout is the lower of that and the profile's cap.
+    """
+    settings = dict(EXECUTION_PROFILES[profile])
+    timeout_ms = int(settings['statement_timeout'])
+    if remaining is not None:
+        if remaining <= 0:
+            raise DeadlineExceeded()
+        remaining_ms = max(int(remaining * 1000), 1)
+        timeout_ms = min(timeout_ms, remaining_ms) if timeout_ms else remaining_ms
+    settings['statement_timeout'] = str(timeout_ms)
+
+    names = tuple(settings)
+    # set_config(..., true) is SET LOCAL with the value as a bound parameter
+    statement = registered_statement('execution_profile', None, names, lambda: sql.SQL(
+        'SELECT ' + ', '.join(f"set_config('{name}', %s, true)" for name in names)))
+    return statement, [settings[name] for name in names]
+
+
+def apply_execution_profile(cursor, deadline=True):
+    """Apply the request's execution profile to the current transaction.
+
+    With deadline=True statements are also limited to what is left of the
+    request's budget, raising DeadlineExceeded once it is used up.
+    """
+    profile = current_execution_profile()
+    statement, params = execution_profile_statement(
+        profile, remaining_time() if deadline else None)
+    execute_statement(cursor, statement, params, timed=False)
+
+
+_timing_lock = threading.Lock()
+_query_timings = {}   # (profile, statement endpoint) -> timing stats
+
+
+def record_query_timing(profile, endpoint, elapsed):
+    """Add one query's duration (seconds) to the stats for its profile"""
+    with _timing_lock:
+        stats = _query_timings.get((profile, endpoint))
+        if stats is None:
+            stats = {'count': 0, 'total': 0.0, 'max': 0.0,
+                     'recent': deque(maxlen=QUERY_TIMING_SAMPLES)}
+            _query_timings[(profile, endpoint)] = stats
+        stats['count'] += 1
+        stats['total'] += elapsed
+        stats['max'] = max(stats['max'], elapsed)
+        stats['recent'].append(elapsed)
+
+
+def query_timing_report():
+    """Per profile and query: count, mean, p50/p95 of recent runs and max, in ms"""
+    report = {}
+    with _timing_lock:
+        for (profile, endpoint), stats in sorted(_query_timings.items()):
+            recent = sorted(stats['recent'])
+            report.setdefault(profile, {})[endpoint] = {
+                'count': stats['count'],
+                'mean_ms': round(stats['total'] / stats['count'] * 1000, 1),
+                'p50_ms': round(recent[len(recent) // 2] * 1000, 1),
+                'p95_ms': round(recent[int(len(recent) * 0.95)] * 1000, 1),
+                'max_ms': round(stats['max'] * 1000, 1),
+            }
+    return report
+
+
+def is_query_canceled(error):
+    """True when Postgres canceled a statement (timeout or cancel request)"""
+    return db_driver.error_code(error) == QUERY_CANCELED
+
+
+def note_brand_status(brand_code, status):
+    """Record how one brand's part of the current response went"""
+    if has_request_context():
+        if g.get('brand_status') is None:
+            g.brand_status = {}
+        g.brand_status[brand_code] = status
+
+
+def response_is_partial():
+    statuses = g.get('brand_status') or {}
+    return any(status in ('timeout', 'canceled') for status in statuses.values())
+
+
+@bp.after_app_request
+def add_partial_headers(response):
+    """Flag responses missing brands that ran out of time"""
+    statuses = g.get('brand_status')
+    if statuses:
+        response.headers['X-Brand-Status'] = ','.join(
+            f'{brand_code}={status}' for brand_code, status in statuses.items())
+        if response_is_partial():
+            response.headers['X-Partial'] = 'true'
+    return response
+
+
+# Concurrent identical computations share one in-flight run
+SINGLE_FLIGHT_TIMEOUT = int(os.getenv('SINGLE_FLIGHT_TIMEOUT', '60'))
+
+_inflight_lock = threading.Lock()
+_inflight = {}   # key -> {'done': Event, 'result': ..., 'error': ...}
+
+
+def single_flight(key, compute):
+    """Run compute once for every concurrent caller asking for the same key.
+
+    The first caller computes; the others wait for it and get its result
+    (or its exception). The leader runs under its own deadline and cancel
+    watch, so when it ran out of time or was canceled the others compute
+    on their own rather than inherit that. So does a caller that waits
+    longer than SINGLE_FLIGHT_TIMEOUT.
+    """
+    with _inflight_lock:
+        flight = _inflight.get(key)
+        leader = flight is None
+        if leader:
+            flight = {'done': threading.Event(), 'result': None, 'error': None}
+            _inflight[key] = flight
+
+    if not leader:
+        if flight['done'].wait(SINGLE_FLIGHT_TIMEOUT):
+            error = flight['error']
+            if error is None:
+                return flight['result']
+            if not (isinstance(error, DeadlineExceeded) or is_query_canceled(error)):
+                raise error
+        return compute()
+
+    try:
+        flight['result'] = compute()
+        return flight['result']
+    except Exception as e:
+        flight['error'] = e
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+        flight['done'].set()
+
+
+def inventory_rollup_query(start_date=None, end_date=None, table=None, brand_code=None):
+    """The GROUPING SETS rollup statement, for all brands or just one, and its parameters"""
+    has_dates = bool(start_date and end_date)
+
+    def build():
+        query = sql.SQL("""
+    WITH latest_slots AS ({latest_slots}
+    )
+    SELECT
+        brand,
+        "Product",
+        GROUPING(brand, "Product") as grouping_level,
+        COUNT(*) as total,
+        COUNT(CASE WHEN "Booked/Not Booked" = 'Booked' THEN 1 END) as booked,
+        COUNT(CASE WHEN "Booked/Not Booked" = 'Not Booked' THEN 1 END) as available,
+        COUNT(CASE WHEN "Booked/Not Booked" IN ('Hold', 'Hold ', 'hold', 'On hold') THEN 1 END) as on_hold
+    FROM latest_slots
+    """).format(latest_slots=latest_slots_composable(table))
+        if has_dates:
+            query += sql.SQL(' WHERE "Dates" = ANY(%s)')
+        return query + sql.SQL(' GROUP BY GROUPING SETS ((brand, "Product"), (brand), ())')
+
+    statement = registered_statement(
+        'rollup', table, (_latest_slots_view['ready'], has_dates), build)
+    params = [brand_code] if table else []
+    if has_dates:
+        params.append(sorted(_slot_dates_in_range(start_date, end_date)))
+    return statement, params
+
+
+def rollup_from_rows(results):
+    """Turn rollup query rows into grand, per-brand and per-product counts"""
+    totals = _empty_counts()
+    by_brand = {brand_code: _empty_counts() for _, brand_code in BRAND_TABLES}
+    by_product = {brand_code: {} for _, brand_code in BRAND_TABLES}
+
+    for brand_code, product, grouping_level, total, booked, available, on_hold in results:
+        counts = {'total': total, 'booked': booked,
+                  'available': available, 'on_hold': on_hold}
+        if grouping_level == 3:
+            totals = counts
+        elif grouping_level == 1:
+            by_brand[brand_code] = counts
+        elif product is not None:
+            by_product[brand_code][product] = counts
+
+    return {'totals': totals, 'by_brand': by_brand, 'by_product': by_product}
+
+
+def query_inventory_rollup(start_date=None, end_date=None, conn=None):
+    """Compute grand, brand and brand x product totals in one GROUPING SETS pass"""
+    statement, params = inventory_rollup_query(start_date, end_date)
+
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    cursor = create_cursor(conn)
+    try:
+        apply_execution_profile(cursor)
+        execute_statement(cursor, statement, params)
+        results = cursor.fetchall()
+    finally:
+        cursor.close()
+        if own_conn:
+            return_db_connection(conn)
+
+    return rollup_from_rows(results)
+
+
+def cache_rollup(cache, key, entry):
+    """Store a rollup cache entry, keeping the cache bounded.
+
+    Keys come from user-supplied date ranges, so expired entries are
+    dropped and, at ROLLUP_CACHE_MAX_ENTRIES, the oldest one is evicted.
+    entry[0] is the time it was fetched.
+    """
+    now = time.time()
+    with _rollup_cache_lock:
+        for stale in [k for k, cached in cache.items()
+                      if now - cached[0] >= AGGREGATE_REFRESH_INTERVAL]:
+            del cache[stale]
+        if key not in cache and len(cache) >= ROLLUP_CACHE_MAX_ENTRIES:
+            del cache[min(cache, key=lambda k: cache[k][0])]
+        cache[key] = entry
+
+
+def get_inventory_rollup(start_date=None, end_date=None, conn=None):
+    """Get grand, per-brand and per-product counts for a date range.
+
+    Served from the incremental aggregates when they are loaded, otherwise
+    from one GROUPING SETS query whose result is shared by every caller for
+    AGGREGATE_REFRESH_INTERVAL seconds.
+    """
+    if INCREMENTAL_AGGREGATES:
+        try:
+            refresh_inventory_aggregates()
+        except Exception as e:
+            print(f"Error refreshing inventory aggregates: {e}")
+        if _aggregate_state['loaded']:
+            note_data_freshness('aggregates', _aggregate_state['refreshed_at'])
+            for _, brand_code in BRAND_TABLES:
+                error = _aggregate_state['brand_errors'].get(brand_code)
+                if error is None:
+                    note_brand_status(brand_code, 'ok')
+                elif brand_code in _aggregate_state['watermarks']:
+                    # Last good counts are still served
+                    note_brand_status(brand_code, 'stale')
+                else:
+                    note_brand_status(brand_code, 'timeout' if error == 'timeout' else 'error')
+            return _counts_from_aggregates(start_date, end_date)
+
+    note_data_freshness(*latest_slots_freshness())
+    cache_key = (start_date, end_date)
+    cached = _rollup_cache.get(cache_key)
+    if cached and time.time() - cached[0] < AGGREGATE_REFRESH_INTERVAL:
+        return cached[1]
+
+    try:
+        rollup = single_flight(
+            ('rollup', start_date, end_date),
+            lambda: query_inventory_rollup(start_date, end_date, conn))
+    except Exception as e:
+        if not (isinstance(e, DeadlineExceeded) or is_query_canceled(e)):
+            raise
+        # Out of time: answer with empty counts flagged as partial
+        print(f"Inventory rollup ran out of time: {e}")
+        if conn is not None:
+            conn.rollback()
+        for _, brand_code in BRAND_TABLES:
+            note_brand_status(brand_code, 'timeout')
+        return {
+            'totals': _empty_counts(),
+            'by_brand': {brand_code: _empty_counts() for _, brand_code in BRAND_TABLES},
+            'by_product': {brand_code: {} for _, brand_code in BRAND_TABLES},
+        }
+    cache_rollup(_rollup_cache, cache_key, (time.time(), rollup))
+    for _, brand_code in BRAND_TABLES:
+        note_brand_status(brand_code, 'ok')
+    return rollup
+
+
+def get_inventory_summary(start_date=None, end_date=None, rollup=None):
+    """Get summary statistics for inventory with optional date filtering"""
+    try:
+        if rollup is None:
+            rollup = get_inventory_rollup(start_date, end_date)
+
+        totals = rollup['totals']
+        summary = {
+            'total_slots': totals['total'],
+            'booked': totals['booked'],
+            'available': totals['available'],
+            'on_hold': totals['on_hold'],
+            'by_brand': {}
+        }
+
+        for brand_code, counts in rollup['by_brand'].items():
+            summary['by_brand'][brand_code] = {
+                'total': counts['total'],
+                'booked': counts['booked'],
+                'available': counts['available'],
+                'on_hold': counts['on_hold'],
+                'percentage': round(
+                    (counts['booked'] / counts['total'] *
+                     100) if counts['total'] > 0 else 0,
+                    1)
+            }
+
+        return summary
+        
+    except Exception as e:
+        print(f"Error getting inventory summary: {e}")
+        return {
+            'total_slots': 0,
+            'booked': 0,
+            'available': 0,
+            'on_hold': 0,
+            'by_brand': {}
+        }
+
+
+def format_brand_overview(summary):
+    """Format an inventory summary as the brand overview list"""
+    brand_data = []
+    for brand_code, data in summary['by_brand'].items():
+        brand_data.append({
+            'brand': brand_code,
+            'total': data['total'],
+            'booked': data['booked'],
+            'available': data['available'],
+            'on_hold': data['on_hold'],
+            'percentage': data['percentage']
+        })
+    return brand_data
+
+
+def format_product_breakdown(rollup):
+    """Format per-product counts as the brand product breakdown"""
+    breakdown_data = {}
+    for brand_code, products in rollup['by_product'].items():
+        breakdown_data[brand_code] = [
+            {
+                'product': product,
+                'total': counts['total'],
+                'booked': counts['booked'],
+                'available': counts['available'],
+                'on_hold': counts['on_hold']
+            }
+            for product, counts in sorted(
+                products.items(), key=lambda item: item[1]['total'], reverse=True)
+        ]
+    return breakdown_data
+
+
+FORM_SUBMISSIONS_SQL = """
+        SELECT 
+                brand,
+                COUNT(*) as form_count
+            FROM data_products.sponsorship_bookings_form_submissions
+            WHERE submit_timestamp >= %s
+            AND submit_timestamp <= %s
+            AND brand IN ('AA', 'BG', 'CFO', 'GT', 'HRD')
+            GROUP BY brand
+        """
+
+
+def form_submissions_statement():
+    return registered_statement(
+        'form_submissions', None, (), lambda: sql.SQL(FORM_SUBMISSIONS_SQL))
+
+
+# Shown when the form submissions table cannot be read
+FORM_SUBMISSIONS_FALLBACK = {
+    'AA': 12,
+    'BG': 8,
+    'CFO': 15,
+    'GT': 6,
+    'HRD': 9,
+}
+
+
+def get_form_submissions_for_week(start_date, end_date, conn=None):
+    """Get form submissions count for each brand for the given week from data_products.sponsorship_bookings_form_submissions"""
+    own_conn = conn is None
+    try:
+        if own_conn:
+            conn = get_db_connection()
+        cursor = create_cursor(conn)
+        try:
+            # Query the real form submissions table
+            apply_execution_profile(cursor)
+            execute_statement(cursor, form_submissions_statement(), (start_date, end_date))
+            results = cursor.fetchall()
+        finally:
+            cursor.close()
+            if own_conn:
+                return_db_connection(conn)
+        form_submissions = {}
+        
+        for row in results:
+            form_submissions[row[0]] = row[1]
+
+        print(
+            f"Found form submissions from data_products.sponsorship_bookings_form_submissions: {form_submissions}")
+
+        # Ensure all brands have a value (default to 0 if not found)
+        for brand_code in ['AA', 'BG', 'CFO', 'GT', 'HRD']:
+            if brand_code not in form_submissions:
+                form_submissions[brand_code] = 0
+
+        print(
+            f"Final form submissions for week {start_date} to {end_date}: {form_submissions}")
+        return form_submissions
+
+    except Exception as e:
+        print(
+            f"Error getting form submissions from data_products.sponsorship_bookings_form_submissions: {e}")
+        if not own_conn:
+            conn.rollback()
+        # Return mock data as fallback
+        return dict(FORM_SUBMISSIONS_FALLBACK)
+
+
+# Frontend status names mapped to database values
+INVENTORY_STATUS_MAP = {
+    'Booked': 'Booked',
+    'Available': 'Not Booked',
+    'On Hold': 'Hold'
+}
+
+# Assemble /api/inventory JSON in Postgres ('database') or in Flask ('python')
+INVENTORY_JSON_MODE = os.getenv('INVENTORY_JSON_MODE', 'database')
+
+
+def build_inventory_filters(status=None, client=None, product=None,
+                            start_date=None, end_date=None):
+    """Build the WHERE conditions shared by the inventory listing queries.
+
+    Conditions refer to the slot as inv and the ledger row as cl.
+    """
+    conditions = []
+    params = []
+
+    if status:
+        conditions.append('inv."Booked/Not Booked" = %s')
+        params.append(INVENTORY_STATUS_MAP.get(status, status))
+
+    if client:
+        conditions.append('cl."Client Name" ILIKE %s')
+        params.append(f'%{client}%')
+
+    if product:
+        conditions.append('inv."Media_Asset" = %s')
+        params.append(product)
+
+    if start_date and end_date:
+        conditions.append('inv."Dates" = ANY(%s)')
+        params.append(sorted(_slot_dates_in_range(start_date, end_date)))
+
+    return conditions, params
+
+
+def brand_rank_sql(column):
+    """SQL for a brand's position in listing order"""
+    brand_order = ', '.join(f"'{brand_code}'" for _, brand_code in BRAND_TABLES)
+    return f"array_position(ARRAY[{brand_order}], {column})"
+
+
+def inventory_listing_query(brand=None, status=None, client=None, product=None,
+                            start_date=None, end_date=None, distinct=True,
+                            listed_brand=None):
+    """Build the inventory listing query over the latest slots of all brands.
+
+    Rows come out ordered by booking ID, newest first; ties go to the brand
+    earlier in listing order, then the lower slot ID and client name, so
+    every reading picks the same row. With distinct=False every slot carrying
+    a booking ID is returned and the caller deduplicates. With listed_brand,
+    only the booking IDs whose latest slot is that brand's are kept, after
+    deduplicating across all brands, so per-brand listings add up to the
+    all-brand one.
+    """
+    conditions, params = build_inventory_filters(
+        status, client, product, start_date, end_date)
+    if brand:
+        conditions.insert(0, 'inv.brand = %s')
+        params.insert(0, brand)
+    if listed_brand:
+        # Only booking IDs the brand has a slot for can end up listed under it
+        conditions.insert(0, 'inv."Booking ID" IN (SELECT "Booking ID" FROM latest_slots WHERE brand = %s)')
+        params.insert(0, listed_brand)
+    where_clause = ''.join(f' AND {condition}' for condition in conditions)
+    distinct_on = 'DISTINCT ON (inv."Booking ID")' if distinct else ''
+
+    query = f"""
+    WITH latest_slots AS (
+        SELECT *
+        FROM ({latest_slots_sql()}) slots
+        WHERE "Booking ID" IS NOT NULL
+        AND "Booking ID" != ''
+    )
+    SELECT {distinct_on}
+        inv."ID" as id,
+        inv."Website_Name" as website_name,
+        inv."Booked/Not Booked" as status,
+        inv."Dates" as slot_date,
+        COALESCE(cl."Client Name", 'No Client') as client,
+        inv."Booking ID" as booking_id,
+        inv."Media_Asset" as product,
+        inv."last_updated" as last_updated,
+        inv.brand as brand
+    FROM latest_slots inv
+    LEFT JOIN campaign_metadata.campaign_ledger cl
+        ON inv."Booking ID" = cl."Booking ID"
+        AND cl."Brand" = inv.brand
+    WHERE 1=1{where_clause}
+    ORDER BY inv."Booking ID", inv."last_updated" DESC, {brand_rank_sql('inv.brand')}, inv."ID",
+        cl."Client Name"
+    """
+    if listed_brand:
+        query = f"SELECT * FROM ({query}) deduplicated WHERE brand = %s"
+        params.append(listed_brand)
+    return query, params
+
+
+def inventory_page_query(endpoint, select, limit, brand=None, status=None, client=None,
+                         product=None, start_date=None, end_date=None, listed_brand=None):
+    """The statement selecting from one listing page, and its parameters.
+
+    The page holds up to limit slots, deduplicated by booking ID across all
+    brands keeping the latest slot, in listing order (brand, booking ID).
+    listed_brand narrows it to the slots that brand wins.
+    """
+    listing_query, params = inventory_listing_query(
+        brand, status, client, product, start_date, end_date, listed_brand=listed_brand)
+
+    query = f"""
+    WITH inventory AS ({listing_query}),
+    page AS (
+        SELECT *, {brand_rank_sql('brand')} as brand_rank
+        FROM inventory
+        ORDER BY brand_rank, booking_id
+        LIMIT %s
+    )
+    {select}
+    """
+    params.append(limit)
+    shape = (_latest_slots_view['ready'], bool(brand), bool(status), bool(client),
+             bool(product), bool(start_date and end_date), bool(listed_brand))
+    return registered_statement(endpoint, None, shape, lambda: sql.SQL(query)), params
+
+
+def inventory_json_query(limit, brand=None, status=None, client=None,
+                         product=None, start_date=None, end_date=None, listed_brand=None):
+    """The statement returning a listing page as (JSON array, row count), and
+    its parameters, with the same fields and ordering as the Python path.
+    """
+    return inventory_page_query('inventory_json', """
+    SELECT COALESCE(json_agg(json_build_object(
+        'id', id,
+        'website_name', website_name,
+        'status', status,
+        'slot_date', slot_date,
+        'client', client,
+        'booking_id', booking_id,
+        'product', product,
+        'price', NULL,
+        'last_updated', last_updated,
+        'brand', brand
+    ) ORDER BY brand_rank, booking_id), '[]')::text, count(*)
+    FROM page""", limit, brand, status, client, product, start_date, end_date, listed_brand)
+
+
+# Slot fields of inventory_rows_query, in column order
+INVENTORY_ROW_FIELDS = ('id', 'website_name', 'status', 'slot_date', 'client',
+                        'booking_id', 'product', 'last_updated', 'brand')
+
+
+def inventory_rows_query(limit, brand=None, status=None, client=None,
+                         product=None, start_date=None, end_date=None, listed_brand=None):
+    """The statement returning a listing page as rows of INVENTORY_ROW_FIELDS"""
+    return inventory_page_query('inventory_rows', f"""
+    SELECT {', '.join(INVENTORY_ROW_FIELDS)}
+    FROM page
+    ORDER BY brand_rank, booking_id""", limit, brand, status, client, product, start_date, end_date,
+        listed_brand)
+
+
+def query_inventory_json(limit, brand=None, status=None, client=None,
+                         product=None, start_date=None, end_date=None, conn=None):
+    """Return the inventory listing as a JSON array assembled by Postgres"""
+    statement, params = inventory_json_query(
+        limit, brand, status, client, product, start_date, end_date)
+
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    cursor = create_cursor(conn)
+    try:
+        execute_statement(cursor, statement, params)
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+        if own_conn:
+            return_db_connection(conn)
+
+
+def read_inventory_by_brand(query_for, take, limit, brand=None, conn=None):
+    """Read a listing page one brand query at a time.
+
+    query_for(remaining, brand_code) gives a brand's statement and params,
+    and take(cursor, remaining) consumes its result and returns how many
+    rows it kept. Brands are read in listing order, each under the request
+    deadline, and reading stops once the page is full. A brand that runs
+    out of time is left out and recorded as timed out rather than failing
+    the page.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    cursor = create_cursor(conn)
+    remaining = limit
+    try:
+        for _, brand_code in BRAND_TABLES:
+            if brand and brand != brand_code:
+                continue
+            if remaining <= 0:
+                break
+            if query_cancel_reason():
+                # Client gone or out of time: skip the remaining brands
+                note_brand_status(brand_code, 'canceled')
+                continue
+
+            statement, params = query_for(remaining, brand_code)
+            try:
+                apply_execution_profile(cursor)
+                execute_statement(cursor, statement, params)
+                count = take(cursor, remaining)
+            except DeadlineExceeded:
+                note_brand_status(brand_code, 'timeout')
+                continue
+            except Exception as e:
+                print(f"Inventory query for {brand_code} failed: {e}")
+                if is_query_canceled(e):
+                    note_brand_status(brand_code, 'canceled' if query_cancel_reason() else 'timeout')
+                else:
+                    note_brand_status(brand_code, 'error')
+                conn.rollback()
+                continue
+
+            note_brand_status(brand_code, 'ok')
+            remaining -= count
+    finally:
+        cursor.close()
+        if own_conn:
+            return_db_connection(conn)
+
+
+def brand_page_query(page_query, remaining, brand_code, brand=None, status=None,
+                     client=None, product=None, start_date=None, end_date=None):
+    """One brand's part of a listing read brand by brand.
+
+    Without a brand filter each brand lists the booking IDs whose latest
+    slot across all brands is its own, so no booking ID shows up twice and
+    every brand page is exact. A brand filter lists that brand alone.
+    """
+    if brand:
+        return page_query(remaining, brand_code, status, client, product, start_date, end_date)
+    return page_query(remaining, None, status, client, product, start_date, end_date,
+                      listed_brand=brand_code)
+
+
+def query_inventory_json_by_brand(limit, brand=None, status=None, client=None,
+                                  product=None, start_date=None, end_date=None,
+                                  conn=None):
+    """Return the inventory listing as a JSON array, one brand query at a time"""
+    fragments = []
+
+    def take(cursor, remaining):
+        payload, count = cursor.fetchone()
+        if count:
+            fragments.append(payload.strip()[1:-1])
+        return count
+
+    read_inventory_by_brand(
+        lambda remaining, brand_code: brand_page_query(
+            inventory_json_query, remaining, brand_code, brand, status, client,
+            product, start_date, end_date),
+        take, limit, brand, conn)
+    return '[' + ', '.join(fragments) + ']'
 
-                for row in results:
-                    try:
-                        slot_data = {
-                            'id': row[0],
-                            'website_name': row[1],
-                            'status': row[2],
-                            'slot_date': row[3],  # Changed from 'dates' to 'slot_date' to match frontend
-                            'client': row[4],
-                            'booking_id': row[5],
-                            'product': row[6],
-                            'price': row[7],
-                            'last_updated': row[8].isoformat() if row[8] else None,
-                            'brand': brand_code
-                        }
-                        all_slots.append(slot_data)
-                        print(f"DEBUG: Added slot {row[0]} to results")
-                    except Exception as row_error:
-                        print(f"DEBUG: Error processing row {row}: {row_error}")
-                        continue
 
-                print(f"DEBUG: Total slots collected so far: {len(all_slots)}")
-            except Exception as e:
-                print(f"ERROR getting data from {table}: {e}")
-                import traceback
-                print(f"ERROR traceback: {traceback.format_exc()}")
+def query_inventory_slots_by_brand(limit, brand=None, status=None, client=None,
+                                   product=None, start_date=None, end_date=None,
+                                   conn=None):
+    """Return the inventory listing as slot dicts, one brand query at a time.
+
+    Same rows and order as query_inventory_json_by_brand.
+    """
+    slots = []
+
+    def take(cursor, remaining):
+        rows = cursor.fetchall()
+        for row in rows:
+            slot = dict(zip(INVENTORY_ROW_FIELDS, row))
+            slot['last_updated'] = slot['last_updated'].isoformat() if slot['last_updated'] else None
+            slots.append(slot)
+        return len(rows)
+
+    read_inventory_by_brand(
+        lambda remaining, brand_code: brand_page_query(
+            inventory_rows_query, remaining, brand_code, brand, status, client,
+            product, start_date, end_date),
+        take, limit, brand, conn)
+    return slots
+
+
+def changed_slots_sql():
+    """SQL for the latest version of every slot changed after a watermark.
+
+    Reads the brand tables directly with the watermark's timestamp pushed
+    into each branch, so the last_updated indexes do the work. Takes that
+    timestamp once per brand table as a parameter; rows sharing it are
+    narrowed down by the caller's keyset condition.
+    """
+    branches = []
+    for table, brand_code in BRAND_TABLES:
+        branches.append(f"""
+        (SELECT DISTINCT ON ("ID")
+            '{brand_code}' AS brand,
+            "ID",
+            "Website_Name",
+            "Booked/Not Booked",
+            "Dates",
+            "Booking ID",
+            "Media_Asset",
+            "Product",
+            last_updated
+        FROM campaign_metadata.{table}
+        WHERE "ID" >= 8000
+        AND last_updated >= %s
+        ORDER BY "ID", last_updated DESC)""")
+    return '\n        UNION ALL'.join(branches)
+
+
+def _naive_utc(value):
+    """Drop the timezone from a timestamp, converting it to UTC first"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def parse_watermark(value):
+    """Parse a since= watermark into (last_updated, brand, slot ID, tombstones).
+
+    A bare ISO timestamp means everything after it; the changes feed hands
+    out "timestamp,brand,ID;epoch.seq" keysets, so a page cut inside a run
+    of rows sharing one timestamp resumes right after the last row sent,
+    and each deletion tombstone is sent once. Tombstones are numbered per
+    process, so the tombstone position is (epoch, seq) with the process's
+    epoch. Brand, ID and the tombstone position are None when absent.
+    Raises ValueError when the value is malformed.
+    """
+    keyset, has_position, position = value.partition(';')
+    timestamp, _, rest = keyset.partition(',')
+    last_updated = _naive_utc(datetime.fromisoformat(timestamp.replace('Z', '+00:00')))
+    tombstones = None
+    if has_position:
+        epoch, _, seq = position.partition('.')
+        if not epoch or not seq:
+            raise ValueError(f"Malformed watermark: {value}")
+        tombstones = (epoch, int(seq))
+    if not rest:
+        return last_updated, None, None, tombstones
+    brand, _, slot_id = rest.partition(',')
+    if not brand or not slot_id:
+        raise ValueError(f"Malformed watermark: {value}")
+    return last_updated, brand, int(slot_id), tombstones
+
+
+def format_watermark(last_updated, brand=None, slot_id=None, tombstones=None):
+    """The since= value for a keyset from parse_watermark"""
+    value = last_updated.isoformat()
+    if brand is not None:
+        value += f",{brand},{slot_id}"
+    if tombstones is not None:
+        value += f";{tombstones[0]}.{tombstones[1]}"
+    return value
+
+
+_tombstone_epoch = {'pid': None, 'epoch': None}
+
+
+def tombstone_epoch():
+    """This process's tombstone numbering, distinct from other workers' and
+    from an earlier process with the same pid"""
+    pid = os.getpid()
+    if _tombstone_epoch['pid'] != pid:
+        _tombstone_epoch.update(pid=pid, epoch=f"{pid:x}{int(time.time()):x}")
+    return _tombstone_epoch['epoch']
+
+
+def get_inventory_changes(since, brand=None, status=None, client=None,
+                          product=None, start_date=None, end_date=None):
+    """Return the slots changed after a (last_updated, brand, ID) watermark, plus tombstones.
+
+    Changed slots that still match the filters come back as slots; the
+    ones that no longer do (booking removed, status changed away from the
+    filter, ...) come back as tombstones, as do slots deleted from the
+    brand tables. Tombstones name the slot by brand and ID, so clients drop
+    whatever entry they hold for it. Pages follow the (last_updated, brand,
+    ID) order and the returned watermark is the key of the last row sent,
+    so a truncated page never skips rows; ask again straight away when
+    truncated is set.
+    """
+    since_time, since_brand, since_id, since_tombstones = since
+    conditions, filter_params = build_inventory_filters(
+        status, client, product, start_date, end_date)
+    matches = ' AND '.join(conditions) or 'TRUE'
+    params = [since_time] * len(BRAND_TABLES) + filter_params
+    if since_brand is None:
+        where = ['inv.last_updated > %s']
+        params.append(since_time)
+    else:
+        where = ['(inv.last_updated, inv.brand, inv."ID") > (%s, %s, %s)']
+        params.extend([since_time, since_brand, since_id])
+    if brand:
+        where.append('inv.brand = %s')
+        params.append(brand)
+
+    query = f"""
+    WITH changed AS ({changed_slots_sql()})
+    SELECT
+        inv."ID" as id,
+        inv."Website_Name" as website_name,
+        inv."Booked/Not Booked" as status,
+        inv."Dates" as slot_date,
+        COALESCE(cl."Client Name", 'No Client') as client,
+        inv."Booking ID" as booking_id,
+        inv."Media_Asset" as product,
+        inv.last_updated as last_updated,
+        inv.brand as brand,
+        COALESCE(inv."Booking ID", '') != '' AND ({matches}) as matches
+    FROM changed inv
+    LEFT JOIN LATERAL (
+        SELECT "Client Name"
+        FROM campaign_metadata.campaign_ledger
+        WHERE "Booking ID" = inv."Booking ID"
+        AND "Brand" = inv.brand
+        LIMIT 1
+    ) cl ON true
+    WHERE {' AND '.join(where)}
+    ORDER BY inv.last_updated, inv.brand, inv."ID"
+    LIMIT %s
+    """
+    params.append(CHANGES_MAX_ROWS + 1)
+
+    conn = get_db_connection()
+    cursor = create_cursor(conn)
+    try:
+        apply_execution_profile(cursor)
+        cursor.execute(query, tuple(params))
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+        return_db_connection(conn)
+
+    truncated = len(rows) > CHANGES_MAX_ROWS
+    rows = rows[:CHANGES_MAX_ROWS]
+    keyset = (since_time, since_brand, since_id)
+    if rows:
+        last = rows[-1]
+        keyset = (_naive_utc(last[7]), last[8], last[0])
+
+    slots = []
+    tombstones = []
+    for row in rows:
+        if row[9]:
+            slots.append({
+                'id': row[0],
+                'website_name': row[1],
+                'status': row[2],
+                'slot_date': row[3],
+                'client': row[4],
+                'booking_id': row[5],
+                'product': row[6],
+                'price': None,
+                'last_updated': row[7].isoformat(),
+                'brand': row[8],
+            })
+        else:
+            tombstones.append({'brand': row[8], 'id': row[0], 'reason': 'changed'})
+
+    # Deletions are found by the background aggregate refresher and
+    # numbered; a watermark from this feed carries the last number sent
+    epoch = tombstone_epoch()
+    with _aggregate_lock:
+        deleted = list(_aggregate_state['tombstones'])
+        tombstone_seq = _aggregate_state['tombstone_seq']
+    for seq, recorded, brand_code, slot_id in deleted:
+        if since_tombstones is not None and since_tombstones[0] == epoch:
+            new = seq > since_tombstones[1]
+        else:
+            # A bare timestamp or another worker's numbering: inclusive on
+            # purpose, as a deletion found after the client's listing may
+            # carry a watermark equal to it
+            new = recorded is None or _naive_utc(recorded) >= since_time
+        if new and (not brand or brand == brand_code):
+            tombstones.append({'brand': brand_code, 'id': slot_id, 'reason': 'deleted'})
+
+    return {
+        'slots': slots,
+        'tombstones': tombstones,
+        'watermark': format_watermark(*keyset, (epoch, tombstone_seq)),
+        'truncated': truncated,
+        # Without incremental aggregates deleted slots are never reported,
+        # so clients have to reload the full listing to see them go
+        'deletions_tracked': INCREMENTAL_AGGREGATES,
+    }
+
+
+# Streaming export settings
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '2000'))
+EXPORT_CHUNK_SIZE = 64 * 1024
+EXPORT_FIELDS = ('id', 'website_name', 'status', 'slot_date', 'client',
+                 'booking_id', 'product', 'price', 'last_updated', 'brand')
+
+
+def _start_export(conn):
+    """Apply the export profile to a connection's transaction"""
+    cursor = conn.cursor()
+    statement, params = execution_profile_statement('export')
+    execute_statement(cursor, statement, params, timed=False)
+    cursor.close()
+
+
+def stream_query_rows(query, params, name='export'):
+    """Yield rows from a named server-side cursor, fetchmany batch by batch"""
+    # Runs after the request has returned, so the role is given explicitly
+    conn = get_db_connection('replica')
+    started = time.time()
+    cursor = None
+    try:
+        _start_export(conn)
+        cursor = db_driver.server_cursor(conn, name)
+        db_driver.execute(cursor, query, tuple(params))
+        for rows in db_driver.stream(cursor, EXPORT_BATCH_SIZE):
+            for row in rows:
+                yield row
+    finally:
+        if cursor is not None:
+            cursor.close()
+        conn.rollback()
+        return_db_connection(conn)
+        record_query_timing('export', name, time.time() - started)
+
+
+def dedupe_by_booking_id(rows):
+    """Keep the first (latest) row of each run of rows with the same booking ID"""
+    previous_booking_id = None
+    for row in rows:
+        booking_id = row[5]
+        if booking_id != previous_booking_id:
+            previous_booking_id = booking_id
+            yield row
+
+
+def _export_record(row):
+    slot_id, website_name, status, slot_date, client, booking_id, product, last_updated, brand = row
+    return {
+        'id': slot_id,
+        'website_name': website_name,
+        'status': status,
+        'slot_date': slot_date,
+        'client': client,
+        'booking_id': booking_id,
+        'product': product,
+        'price': None,
+        'last_updated': last_updated.isoformat() if last_updated else None,
+        'brand': brand
+    }
+
+
+def serialize_ndjson(rows):
+    for row in rows:
+        yield json.dumps(_export_record(row)) + '\n'
+
+
+def serialize_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(_export_record(row))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def chunked(pieces, chunk_size=EXPORT_CHUNK_SIZE):
+    """Group small string pieces into chunks of about chunk_size bytes"""
+    chunk = []
+    size = 0
+    for piece in pieces:
+        chunk.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield ''.join(chunk)
+            chunk = []
+            size = 0
+    if chunk:
+        yield ''.join(chunk)
+
+
+# Arrow IPC exports for analyst tooling
+ARROW_STREAM_MIMETYPE = 'application/vnd.apache.arrow.stream'
+ARROW_DICTIONARY_COLUMNS = ('brand', 'status', 'product', 'Brand')
+
+
+def _arrow_type_for(type_code):
+    """Map a Postgres type OID to an Arrow type (strings by default)"""
+    return {
+        16: pa.bool_(),
+        20: pa.int64(),
+        21: pa.int16(),
+        23: pa.int32(),
+        700: pa.float32(),
+        701: pa.float64(),
+        1700: pa.float64(),
+        1082: pa.date32(),
+        1114: pa.timestamp('us'),
+        1184: pa.timestamp('us', tz='UTC'),
+    }.get(type_code, pa.string())
+
+
+def _arrow_value(value, arrow_type):
+    if value is None:
+        return None
+    if arrow_type in (pa.float32(), pa.float64()):
+        return float(value)
+    if arrow_type == pa.string() and not isinstance(value, str):
+        return str(value)
+    return value
+
+
+def stream_arrow_ipc(query, params, name='arrow_export'):
+    """Stream a query as Arrow IPC record batches, one per cursor fetch.
+
+    Column types come from the cursor description; the columns in
+    ARROW_DICTIONARY_COLUMNS are dictionary encoded with dictionaries that
+    only grow, so later batches are sent as dictionary deltas.
+    """
+    # Runs after the request has returned, so the role is given explicitly
+    conn = get_db_connection('replica')
+    started = time.time()
+    cursor = None
+    sink = io.BytesIO()
+    writer = None
+    try:
+        _start_export(conn)
+        cursor = db_driver.server_cursor(conn, name)
+        db_driver.execute(cursor, query, tuple(params))
+        while True:
+            rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+
+            if writer is None:
+                fields = []
+                for column in cursor.description:
+                    value_type = _arrow_type_for(column[1])
+                    if column[0] in ARROW_DICTIONARY_COLUMNS:
+                        value_type = pa.dictionary(pa.int32(), pa.string())
+                    fields.append(pa.field(column[0], value_type))
+                schema = pa.schema(fields)
+                writer = pa.ipc.new_stream(
+                    sink, schema,
+                    options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+                dictionaries = {field.name: ([], {}) for field in schema
+                                if pa.types.is_dictionary(field.type)}
+
+            if not rows:
+                break
+
+            arrays = []
+            for index, field in enumerate(schema):
+                values = [row[index] for row in rows]
+                if field.name in dictionaries:
+                    dictionary, codes = dictionaries[field.name]
+                    indices = []
+                    for value in values:
+                        if value is None:
+                            indices.append(None)
+                            continue
+                        code = codes.get(value)
+                        if code is None:
+                            code = codes[value] = len(dictionary)
+                            dictionary.append(value)
+                        indices.append(code)
+                    arrays.append(pa.DictionaryArray.from_arrays(
+                        pa.array(indices, type=pa.int32()),
+                        pa.array(dictionary, type=pa.string())))
+                else:
+                    arrays.append(pa.array(
+                        [_arrow_value(value, field.type) for value in values],
+                        type=field.type))
+
+            writer.write_batch(pa.record_batch(arrays, schema=schema))
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+
+        writer.close()
+        yield sink.getvalue()
+    finally:
+        if cursor is not None:
+            cursor.close()
+        conn.rollback()
+        return_db_connection(conn)
+        record_query_timing('export', name, time.time() - started)
+
+
+def latest_slots_arrow_query(brand=None, status=None, start_date=None, end_date=None):
+    """Query for the latest version of every slot, for the Arrow export"""
+    conditions = []
+    params = []
+    if brand:
+        conditions.append('inv.brand = %s')
+        params.append(brand)
+    if status:
+        conditions.append('inv."Booked/Not Booked" = %s')
+        params.append(INVENTORY_STATUS_MAP.get(status, status))
+    if start_date and end_date:
+        conditions.append('inv."Dates" = ANY(%s)')
+        params.append(sorted(_slot_dates_in_range(start_date, end_date)))
+    where_clause = ''.join(f' AND {condition}' for condition in conditions)
+
+    query = f"""
+    SELECT
+        inv.brand as brand,
+        inv."ID"::bigint as id,
+        inv."Website_Name" as website_name,
+        inv."Booked/Not Booked" as status,
+        inv."Dates" as slot_date,
+        inv."Booking ID" as booking_id,
+        inv."Media_Asset" as product,
+        inv."last_updated"::timestamp as last_updated
+    FROM ({latest_slots_sql()}) inv
+    WHERE 1=1{where_clause}
+    ORDER BY inv.brand, inv."ID"
+    """
+    return query, params
+
+
+# Columnar /api/inventory output: plain column arrays, plus string columns
+# stored as integer codes into a per-column dictionary
+COLUMNAR_PLAIN_FIELDS = ('id', 'slot_date', 'booking_id', 'last_updated')
+COLUMNAR_DICTIONARY_FIELDS = ('brand', 'status', 'product', 'website_name', 'client')
+
+
+def to_columnar(slots):
+    """Convert inventory slot dicts to the compact columnar format.
+
+    The always-NULL price field is left out.
+    """
+    columns = {field: [] for field in COLUMNAR_PLAIN_FIELDS + COLUMNAR_DICTIONARY_FIELDS}
+    dictionaries = {field: [] for field in COLUMNAR_DICTIONARY_FIELDS}
+    codes = {field: {} for field in COLUMNAR_DICTIONARY_FIELDS}
+
+    for slot in slots:
+        for field in COLUMNAR_PLAIN_FIELDS:
+            columns[field].append(slot.get(field))
+        for field in COLUMNAR_DICTIONARY_FIELDS:
+            value = slot.get(field)
+            code = codes[field].get(value)
+            if code is None:
+                code = len(dictionaries[field])
+                codes[field][value] = code
+                dictionaries[field].append(value)
+            columns[field].append(code)
+
+    return {
+        'format': 'columnar',
+        'count': len(slots),
+        'columns': columns,
+        'dictionaries': dictionaries
+    }
+
+
+# Response cache and compression settings
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', '30'))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '256'))
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+COMPRESSIBLE_MIMETYPES = (
+    'application/json',
+    'application/x-ndjson',
+    'text/html',
+    'text/csv',
+    'text/plain',
+)
+
+_response_cache_lock = threading.Lock()
+_response_cache = {}   # normalized request -> cache entry
+
+
+def _cache_key():
+    """Normalize the current request path and arguments into a cache key"""
+    args = '&'.join(f'{key}={value}' for key, value in sorted(request.args.items(multi=True)))
+    return f'{request.path}?{args}'
+
+
+def negotiate_encoding(accept_encoding):
+    """Pick br or gzip from an Accept-Encoding header, or None"""
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    if BROTLI_AVAILABLE and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+
+def compress_body(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, compresslevel=6)
+
+
+def encoded_body(entry, encoding):
+    """Return a cache entry's body in an encoding, compressing it only once"""
+    body = entry['encodings'].get(encoding)
+    if body is None:
+        body = compress_body(entry['body'], encoding)
+        entry['encodings'][encoding] = body
+    return body
+
+
+def _response_from_entry(entry, cache_status):
+    """Rebuild a response from a cache (or single-flight) entry"""
+    if entry['status'] == 200:
+        g.cache_entry = entry
+    note_data_freshness(entry['data_source'], entry['data_refreshed_at'])
+    g.brand_status = entry.get('brand_status')
+    response = Response(entry['body'], status=entry['status'], mimetype=entry['mimetype'])
+    response.headers['X-Cache'] = cache_status
+    return response
+
+
+def cached_response(view):
+    """Cache a view's successful responses for RESPONSE_CACHE_TTL seconds.
+
+    Entries keep their compressed variants next to the raw body, so each
+    encoding is produced once per cache fill rather than once per request.
+    Identical requests arriving during a miss wait for the one in flight
+    and share its response (X-Cache: COALESCED).
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = _cache_key()
+        entry = _response_cache.get(key)
+        if entry and time.time() - entry['created'] < RESPONSE_CACHE_TTL:
+            return _response_from_entry(entry, 'HIT')
+
+        computed = []
+
+        def compute():
+            response = current_app.make_response(view(*args, **kwargs))
+            computed.append(response)
+            if response.is_streamed:
+                return None
+            return {
+                'body': response.get_data(),
+                'status': response.status_code,
+                'mimetype': response.mimetype,
+                'created': time.time(),
+                'encodings': {},
+                'data_source': g.get('data_source'),
+                'data_refreshed_at': g.get('data_refreshed_at'),
+                'brand_status': g.get('brand_status'),
+                'partial': bool(g.get('served_stale')) or response_is_partial(),
+            }
+
+        entry = single_flight(('response', key), compute)
+        if not computed:
+            # Another request computed this one. A failed, stale or partial
+            # answer may come from the leader's own deadline or disconnect,
+            # so it is not passed on; this request computes its own
+            if entry is None or entry['status'] != 200 or entry['partial']:
+                return view(*args, **kwargs)
+            return _response_from_entry(entry, 'COALESCED')
+
+        response = computed[0]
+        if entry is None or entry['status'] != 200 or entry['partial']:
+            # Partial results are not worth keeping around
+            return response
+
+        with _response_cache_lock:
+            if len(_response_cache) >= RESPONSE_CACHE_MAX_ENTRIES:
+                oldest = min(_response_cache, key=lambda k: _response_cache[k]['created'])
+                del _response_cache[oldest]
+            _response_cache[key] = entry
+
+        g.cache_entry = entry
+        response.headers['X-Cache'] = 'MISS'
+        return response
+
+    return wrapper
+
+
+@bp.after_app_request
+def compress_response(response):
+    """Compress eligible responses according to Accept-Encoding"""
+    if (response.direct_passthrough or response.is_streamed or
+            response.status_code < 200 or response.status_code >= 300 or
+            'Content-Encoding' in response.headers or
+            response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''))
+    if not encoding:
+        return response
+
+    entry = g.get('cache_entry')
+    if entry is not None:
+        if len(entry['body']) < COMPRESSION_MIN_SIZE:
+            return response
+        body = encoded_body(entry, encoding)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESSION_MIN_SIZE:
+            return response
+        body = compress_body(data, encoding)
+
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+# Admission control: each budget admits a few requests at a time and queues
+# a few more; beyond that requests are shed instead of piling up on workers.
+# ADMISSION_LIMITS overrides budgets as "name=concurrency:queue,...".
+# gunicorn.conf.py sizes gthread workers from these; keep its
+# DEFAULT_ADMISSION_LIMITS in step.
+ADMISSION_DEFAULT_LIMITS = {
+    'inventory': (2, 2),   # listing and changes feed
+    'export': (1, 1),      # streamed NDJSON/CSV/Arrow exports
+    'summary': (3, 3),     # overview, weekly, breakdown, clients, batch
+    'debug': (1, 0),       # debug endpoints never queue
+}
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '10'))
+ADMISSION_RETRY_AFTER = int(os.getenv('ADMISSION_RETRY_AFTER', '5'))
+# Oldest cached response still served as stale when a budget is full
+RESPONSE_STALE_MAX = int(os.getenv('RESPONSE_STALE_MAX', '300'))
+
+
+def _admission_limits():
+    limits = dict(ADMISSION_DEFAULT_LIMITS)
+    for item in os.getenv('ADMISSION_LIMITS', '').split(','):
+        name, _, value = item.strip().partition('=')
+        if not value:
+            continue
+        try:
+            concurrency, _, queue_size = value.partition(':')
+            limits[name] = (int(concurrency), int(queue_size or 0))
+        except ValueError:
+            print(f"Ignoring invalid ADMISSION_LIMITS entry: {item}")
+    return limits
+
+
+_admission_budgets = {
+    name: {
+        'limit': limit,
+        'queue': queue_size,
+        'active': 0,
+        'waiting': 0,
+        'rejected': 0,
+        'condition': threading.Condition(),
+    }
+    for name, (limit, queue_size) in _admission_limits().items()
+}
+
+
+def _admit(budget):
+    """Take a slot in a budget, waiting in its queue if there is room"""
+    with budget['condition']:
+        if budget['active'] < budget['limit']:
+            budget['active'] += 1
+            return True
+        if budget['waiting'] >= budget['queue']:
+            budget['rejected'] += 1
+            return False
+
+        budget['waiting'] += 1
+        try:
+            admitted = budget['condition'].wait_for(
+                lambda: budget['active'] < budget['limit'], ADMISSION_QUEUE_TIMEOUT)
+        finally:
+            budget['waiting'] -= 1
+        if not admitted:
+            budget['rejected'] += 1
+            return False
+        budget['active'] += 1
+        return True
+
+
+def _release(budget):
+    with budget['condition']:
+        budget['active'] -= 1
+        budget['condition'].notify()
+
+
+def _shed_response(budget_name):
+    """Answer a request its budget could not admit: stale data or a 503.
+
+    Cached responses up to RESPONSE_STALE_MAX seconds old count as stale
+    data; older ones are not served.
+    """
+    stale = _response_cache.get(_cache_key())
+    if stale is not None and time.time() - stale['created'] <= RESPONSE_STALE_MAX:
+        g.served_stale = True
+        return _response_from_entry(stale, 'STALE')
+
+    response = jsonify({"error": f"Server busy ({budget_name}), retry shortly"})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(ADMISSION_RETRY_AFTER)
+    return response
+
+
+def admission(budget_name):
+    """Limit a view's concurrency to its budget, shedding load when full.
+
+    Put it under @cached_response so cache hits never take a slot. Slots
+    of streamed responses are held until the stream is closed.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            budget = _admission_budgets[budget_name]
+            if not _admit(budget):
+                return _shed_response(budget_name)
+
+            try:
+                response = current_app.make_response(view(*args, **kwargs))
+            except Exception:
+                _release(budget)
+                raise
+            if response.is_streamed:
+                response.call_on_close(lambda: _release(budget))
+            else:
+                _release(budget)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+# Dashboard page held in memory with validators and precompressed bodies
+INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'index.html')
+INDEX_RELOAD = os.getenv('INDEX_RELOAD', 'false').lower() == 'true'
+
+# Dashboard data embedded into the page so it renders without waiting on
+# the API; 0 disables the bootstrap
+BOOTSTRAP_REFRESH_INTERVAL = int(os.getenv('BOOTSTRAP_REFRESH_INTERVAL', '30'))
+BOOTSTRAP_MAX_AGE = int(os.getenv('BOOTSTRAP_MAX_AGE', '600'))
+
+_index_lock = threading.Lock()
+_index_page = {
+    'template': None,
+    'mtime': None,
+    'bootstrap': None,           # encoded bootstrap JSON
+    'bootstrap_version': None,   # data version it was built from
+    'bootstrap_digest': None,    # hash of its content, minus generated_at
+    'bootstrap_built': 0,
+    'page': None,                # body, etag, last_modified, encodings
+}
+
+
+def _build_index_page():
+    """Render the page from the template and bootstrap, hash and precompress it"""
+    with _index_lock:
+        template = _index_page['template']
+        bootstrap = _index_page['bootstrap']
+        if template is None:
+            _index_page['page'] = None
+            return
+
+        body = template
+        last_modified = _index_page['mtime']
+        if bootstrap is not None:
+            script = (b'<script id="dashboard-bootstrap" type="application/json">' +
+                      bootstrap + b'</script>\n</head>')
+            body = template.replace(b'</head>', script, 1)
+            last_modified = max(last_modified, _index_page['bootstrap_built'])
+
+        encodings = {'gzip': gzip.compress(body, compresslevel=9)}
+        if BROTLI_AVAILABLE:
+            encodings['br'] = brotli.compress(body, quality=11)
+
+        # Swapped in as one object so requests never mix two versions
+        _index_page['page'] = {
+            'body': body,
+            'etag': hashlib.sha256(body).hexdigest()[:32],
+            'last_modified': datetime.fromtimestamp(int(last_modified), timezone.utc),
+            'encodings': encodings,
+        }
+
+
+def load_index_page():
+    """Read index.html into memory and render it"""
+    try:
+        with open(INDEX_PATH, 'rb') as f:
+            template = f.read()
+        mtime = os.path.getmtime(INDEX_PATH)
+    except FileNotFoundError:
+        print(f"Dashboard file not found: {INDEX_PATH}")
+        template, mtime = None, None
+
+    _index_page['template'] = template
+    _index_page['mtime'] = mtime
+    _build_index_page()
+
+
+def _reload_index_page_if_changed():
+    try:
+        mtime = os.path.getmtime(INDEX_PATH)
+    except FileNotFoundError:
+        mtime = None
+    if mtime != _index_page['mtime']:
+        load_index_page()
+
+
+def build_bootstrap_payload():
+    """Compute the data the dashboard needs for its first paint.
+
+    Everything comes from one connection and one rollup, like /api/batch.
+    """
+    conn = get_db_connection()
+    try:
+        rollups = {}
+
+        def get_rollup(start_date=None, end_date=None):
+            key = (start_date, end_date)
+            if key not in rollups:
+                rollups[key] = get_inventory_rollup(start_date, end_date, conn)
+            return rollups[key]
+
+        parts = {
+            'brand_overview': json.dumps(brand_overview_payload(get_rollup=get_rollup)),
+            'weekly_comparison': json.dumps(weekly_comparison_payload(get_rollup, conn)),
+            'clients': json.dumps(clients_payload(conn)),
+            # Default listing as built by Postgres, spliced in unparsed
+            'inventory': query_inventory_json(100, conn=conn),
+        }
+    finally:
+        return_db_connection(conn)
+
+    digest = hashlib.sha256(''.join(parts.values()).encode('utf-8')).hexdigest()
+    parts['generated_at'] = json.dumps(datetime.now(timezone.utc).isoformat())
+    body = '{' + ', '.join(f'"{key}": {value}' for key, value in parts.items()) + '}'
+    # Keep the JSON from closing the script element it is embedded in
+    return body.replace('</', '<\\/').encode('utf-8'), digest
+
+
+def refresh_index_bootstrap(force=False):
+    """Rebuild the page bootstrap when the dashboard data has changed"""
+    today = datetime.now().date()
+    version = (_stream_data_version(), today - timedelta(days=today.weekday()))
+    age = time.time() - _index_page['bootstrap_built']
+    if not force and version == _index_page['bootstrap_version'] and age < BOOTSTRAP_MAX_AGE:
+        return
+
+    started = time.time()
+    bootstrap, digest = build_bootstrap_payload()
+    _index_page['bootstrap_version'] = version
+    if not force and digest == _index_page['bootstrap_digest'] and age < BOOTSTRAP_MAX_AGE:
+        # Same numbers as before; keep the page and its ETag
+        return
+    _index_page['bootstrap'] = bootstrap
+    _index_page['bootstrap_digest'] = digest
+    _index_page['bootstrap_built'] = time.time()
+    _build_index_page()
+    print(f"Rebuilt dashboard bootstrap ({len(bootstrap)} bytes) in {time.time() - started:.2f}s")
+
+
+def _index_bootstrap_refresher():
+    """Background loop keeping the embedded bootstrap current"""
+    while True:
+        try:
+            refresh_index_bootstrap()
+        except Exception as e:
+            print(f"Error refreshing dashboard bootstrap: {e}")
+        time.sleep(BOOTSTRAP_REFRESH_INTERVAL)
+
+
+@bp.route('/')
+def index():
+    """Serve the main dashboard"""
+    if INDEX_RELOAD or current_app.debug:
+        _reload_index_page_if_changed()
+
+    page = _index_page['page']
+    if page is None:
+        return "Dashboard file not found", 404
+
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''))
+    body = page['encodings'].get(encoding) if encoding else None
+    if body is None:
+        encoding = None
+        body = page['body']
+
+    response = Response(body, mimetype='text/html')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    # Each encoding is a different representation, so it gets its own ETag
+    response.set_etag(f"{page['etag']}-{encoding}" if encoding else page['etag'])
+    response.last_modified = page['last_modified']
+    # Revalidate every time (cheap 304s): embedded data goes stale, and a
+    # page sent before the first bootstrap must not be kept once one exists
+    response.cache_control.no_cache = True
+    response.vary.add('Accept-Encoding')
+    return response.make_conditional(request)
+
+
+@bp.route('/api/inventory')
+def api_inventory():
+    """API endpoint for inventory data with filtering; since= asks for changes"""
+    if request.args.get('since'):
+        # Delta sync: only what changed after the client's watermark. These
+        # answers are per-watermark and live, so they bypass the response cache
+        return api_inventory_changes()
+    return inventory_listing()
+
+
+@cached_response
+@admission('inventory')
+@execution_profile('interactive')
+def inventory_listing():
+    """The inventory listing for the current request's filters"""
+    conn = None
+    try:
+        # Get query parameters
+        limit = request.args.get('limit', 100, type=int)
+        brand = request.args.get('brand')
+        status = request.args.get('status')
+        client = request.args.get('client')
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+
+        product = request.args.get('product')
+        response_format = request.args.get('format', 'objects')
+
+        if response_format == 'columnar':
+            columnar = to_columnar(query_inventory_slots_by_brand(
+                limit, brand, status, client, product, start_date, end_date))
+            note_data_freshness(*latest_slots_freshness())
+            columnar['partial'] = response_is_partial()
+            columnar['brand_status'] = g.get('brand_status') or {}
+            return jsonify(columnar)
+
+        if INVENTORY_JSON_MODE == 'database':
+            # Postgres builds the final JSON array; pass it through as-is
+            payload = query_inventory_json_by_brand(
+                limit, brand, status, client, product, start_date, end_date)
+            note_data_freshness(*latest_slots_freshness())
+            if payload != '[]':
+                return Response(payload, mimetype='application/json')
+            return jsonify({
+                "error": "No data found",
+                "debug": {
+                    "tables_processed": len(BRAND_TABLES),
+                    "brand_filter": brand,
+                    "message": "Check server logs for detailed debug information"
+                }
+            })
+
+        conn = get_db_connection()
+        cursor = create_cursor(conn)
+        note_data_freshness(*latest_slots_freshness())
+
+        brand_tables = BRAND_TABLES
+
+        all_slots = []
+
+        for table, brand_code in brand_tables:
+            # Skip if brand filter is specified and doesn't match
+            if brand and brand != brand_code:
+                continue
+            if query_cancel_reason():
+                # Client gone or out of time: skip the remaining brands
+                note_brand_status(brand_code, 'canceled')
+                continue
+
+            conditions, params = build_inventory_filters(
+                status, client, product, start_date, end_date)
+
+            def build():
+                # Build query WITH JOIN to get client names
+                base_query = sql.SQL("""
+            WITH latest_slots AS (
+                SELECT *
+                FROM ({latest_slots}) slots
+                WHERE "Booking ID" IS NOT NULL
+                AND "Booking ID" != ''
+            )
+            SELECT DISTINCT ON (inv."Booking ID")
+                inv."ID",
+                inv."Website_Name",
+                inv."Booked/Not Booked",
+                inv."Dates",
+                COALESCE(cl."Client Name", 'No Client') as "Client",
+                inv."Booking ID",
+                inv."Media_Asset" as "Product",
+                NULL as "Price",
+                inv."last_updated"
+            FROM latest_slots inv
+            LEFT JOIN campaign_metadata.campaign_ledger cl 
+                ON inv."Booking ID" = cl."Booking ID" 
+                AND cl."Brand" = %s
+            WHERE 1=1
+            """).format(latest_slots=latest_slots_composable(table))
+                for condition in conditions:
+                    base_query += sql.SQL(f' AND {condition}')
+
+                # Add LIMIT per table to prevent timeout
+                # Order by Booking ID and last_updated to ensure DISTINCT ON works correctly
+                return base_query + sql.SQL(
+                    ' ORDER BY inv."Booking ID", inv."last_updated" DESC LIMIT 1000')
+
+            shape = (_latest_slots_view['ready'], bool(status), bool(client),
+                     bool(product), bool(start_date and end_date))
+            statement = registered_statement('inventory_python', table, shape, build)
+            params = [brand_code, brand_code] + params
+
+            try:
+                apply_execution_profile(cursor)
+                execute_statement(cursor, statement, params)
+                results = cursor.fetchall()
+                note_brand_status(brand_code, 'ok')
+            except Exception as query_error:
+                # Out of time: leave the brand out and flag the response
+                timed_out = (isinstance(query_error, DeadlineExceeded) or
+                             is_query_canceled(query_error))
+                if query_cancel_reason():
+                    note_brand_status(brand_code, 'canceled')
+                else:
+                    note_brand_status(brand_code, 'timeout' if timed_out else 'error')
+                print(f"Error querying inventory from {table}: {query_error}")
+                # Rollback transaction on error to allow other queries to proceed
+                conn.rollback()
+                continue
+
+            if not results:
                 continue
 
+            for row in results:
+                try:
+                    slot_data = {
+                        'id': row[0],
+                        'website_name': row[1],
+                        'status': row[2],
+                        'slot_date': row[3],  # Changed from 'dates' to 'slot_date' to match frontend
+                        'client': row[4],
+                        'booking_id': row[5],
+                        'product': row[6],
+                        'price': row[7],
+                        'last_updated': row[8].isoformat() if row[8] else None,
+                        'brand': brand_code
+                    }
+                    all_slots.append(slot_data)
+                except Exception as row_error:
+                    print(f"Error processing inventory row from {table}: {row_error}")
+                    continue
+
         # Close connection after processing all tables
         cursor.close()
-        conn.close()
-        
-        print(f"DEBUG: Before limit - total slots: {len(all_slots)}")
-        print(f"DEBUG: Processed {len(brand_tables)} brand tables")
+        return_db_connection(conn)
+        conn = None
 
         # Deduplicate by booking_id, keeping the one with latest last_updated
         from datetime import datetime
@@ -554,17 +3055,10 @@ def api_inventory():
         
         # Convert map back to list
         all_slots = list(booking_id_map.values())
-        print(f"DEBUG: After deduplication - {len(all_slots)} unique booking IDs")
 
         # Apply global LIMIT after collecting from all tables
-        if len(all_slots) > limit:
-            all_slots = all_slots[:limit]
-            print(f"DEBUG: Applied limit {limit}, now returning {len(all_slots)} slots")
-        else:
-            print(f"DEBUG: No limit applied, returning all {len(all_slots)} slots")
+        all_slots = all_slots[:limit]
 
-        print(f"DEBUG: Final return - {len(all_slots)} slots")
-        
         # If still empty, return error info for debugging
         if len(all_slots) == 0:
             print(f"WARNING: Inventory endpoint returning empty array after processing all tables")
@@ -584,158 +3078,555 @@ def api_inventory():
         import traceback
         print(f"Inventory API traceback: {traceback.format_exc()}")
         return jsonify({"error": str(e)}), 500
+    finally:
+        if conn:
+            return_db_connection(conn)
 
 
-@app.route('/api/brand-overview')
+def inventory_changes_response():
+    """Answer a since= request with the changes after that watermark"""
+    try:
+        since = parse_watermark(request.args.get('since', ''))
+    except ValueError:
+        return jsonify({"error": "since must be an ISO 8601 timestamp or a watermark from this feed"}), 400
+
+    changes = get_inventory_changes(
+        since,
+        brand=request.args.get('brand'),
+        status=request.args.get('status'),
+        client=request.args.get('client'),
+        product=request.args.get('product'),
+        start_date=request.args.get('start_date'),
+        end_date=request.args.get('end_date'),
+    )
+    note_data_freshness('live', None)
+    return jsonify(changes)
+
+
+@bp.route('/api/inventory/changes')
+@admission('inventory')
+@execution_profile('interactive')
+def api_inventory_changes():
+    """Changes feed: slots updated after since=, tombstones and a new watermark"""
+    try:
+        return inventory_changes_response()
+    except Exception as e:
+        print(f"Inventory changes API Error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.route('/api/inventory/export')
+@admission('export')
+@execution_profile('export')
+def api_inventory_export():
+    """Stream the full deduplicated inventory as NDJSON or CSV"""
+    try:
+        response_format = request.args.get('format', 'ndjson')
+        if response_format not in ('ndjson', 'csv'):
+            return jsonify({"error": "format must be ndjson or csv"}), 400
+
+        query, params = inventory_listing_query(
+            brand=request.args.get('brand'),
+            status=request.args.get('status'),
+            client=request.args.get('client'),
+            product=request.args.get('product'),
+            start_date=request.args.get('start_date'),
+            end_date=request.args.get('end_date'),
+            distinct=False)
+        note_data_freshness(*latest_slots_freshness())
+
+        # rows -> dedup -> serialize -> chunks, one batch in memory at a time
+        rows = dedupe_by_booking_id(
+            stream_query_rows(query, params, name='inventory_export'))
+        if response_format == 'csv':
+            body = chunked(serialize_csv(rows))
+            mimetype = 'text/csv'
+        else:
+            body = chunked(serialize_ndjson(rows))
+            mimetype = 'application/x-ndjson'
+
+        return Response(body, mimetype=mimetype, headers={
+            'Content-Disposition': f'attachment; filename=inventory.{response_format}'
+        })
+
+    except Exception as e:
+        print(f"Inventory Export API Error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.route('/api/arrow/latest-slots')
+@admission('export')
+@execution_profile('export')
+def api_arrow_latest_slots():
+    """Stream the latest inventory slots as an Arrow IPC stream"""
+    try:
+        if not ARROW_AVAILABLE:
+            return jsonify({"error": "pyarrow not available"}), 501
+
+        query, params = latest_slots_arrow_query(
+            brand=request.args.get('brand'),
+            status=request.args.get('status'),
+            start_date=request.args.get('start_date'),
+            end_date=request.args.get('end_date'))
+        note_data_freshness(*latest_slots_freshness())
+
+        return Response(
+            stream_arrow_ipc(query, params, name='latest_slots_arrow'),
+            mimetype=ARROW_STREAM_MIMETYPE,
+            headers={'Content-Disposition': 'attachment; filename=latest_slots.arrows'})
+
+    except Exception as e:
+        print(f"Arrow Latest Slots API Error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.route('/api/arrow/ledger')
+@admission('export')
+@execution_profile('export')
+def api_arrow_ledger():
+    """Stream the campaign ledger as an Arrow IPC stream"""
+    try:
+        if not ARROW_AVAILABLE:
+            return jsonify({"error": "pyarrow not available"}), 501
+
+        query = "SELECT * FROM campaign_metadata.campaign_ledger cl WHERE 1=1"
+        params = []
+
+        brand = request.args.get('brand')
+        if brand:
+            query += ' AND cl."Brand" = %s'
+            params.append(brand)
+
+        client = request.args.get('client')
+        if client:
+            query += ' AND cl."Client Name" ILIKE %s'
+            params.append(f'%{client}%')
+
+        return Response(
+            stream_arrow_ipc(query, params, name='ledger_arrow'),
+            mimetype=ARROW_STREAM_MIMETYPE,
+            headers={'Content-Disposition': 'attachment; filename=campaign_ledger.arrows'})
+
+    except Exception as e:
+        print(f"Arrow Ledger API Error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+def brand_overview_payload(start_date=None, end_date=None, get_rollup=get_inventory_rollup):
+    """Build the /api/brand-overview response body"""
+    summary = get_inventory_summary(
+        start_date, end_date, rollup=get_rollup(start_date, end_date))
+    return format_brand_overview(summary)
+
+
+def weekly_comparison_payload(get_rollup=get_inventory_rollup, conn=None):
+    """Build the /api/weekly-comparison response body for the current week"""
+    # Get current week's data
+    today = datetime.now()
+    # Get Monday of current week
+    monday = today - timedelta(days=today.weekday())
+    sunday = monday + timedelta(days=6)
+
+    # Format dates for display
+    week_range = f"{monday.strftime('%b %d, %Y')} to {sunday.strftime('%b %d, %Y')}"
+
+    # Get inventory summary for current week with date filtering
+    start_date = monday.strftime('%Y-%m-%d')
+    end_date = sunday.strftime('%Y-%m-%d')
+    summary = get_inventory_summary(
+        start_date, end_date, rollup=get_rollup(start_date, end_date))
+
+    # Get form submissions from database
+    form_submissions = get_form_submissions_for_week(monday, sunday, conn)
+
+    # Format data for frontend
+    weekly_data = []
+    for brand_code, data in summary['by_brand'].items():
+        weekly_data.append({
+            'brand': brand_code,
+            'scheduled': data['booked'],
+            'form_submissions': form_submissions.get(brand_code, 0)
+        })
+
+    return {
+        'week_range': week_range,
+        'data': weekly_data
+    }
+
+
+def product_breakdown_payload(start_date=None, end_date=None, get_rollup=get_inventory_rollup):
+    """Build the /api/brand-product-breakdown response body"""
+    return format_product_breakdown(get_rollup(start_date, end_date))
+
+
+@bp.route('/api/brand-overview')
+@cached_response
+@admission('summary')
+@execution_profile('aggregate')
 def api_brand_overview():
     """API endpoint for brand overview data"""
     try:
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
-        
-        summary = get_inventory_summary(start_date, end_date)
-
-        # Format data for frontend
-        brand_data = []
-        for brand_code, data in summary['by_brand'].items():
-            brand_data.append({
-                'brand': brand_code,
-                'total': data['total'],
-                'booked': data['booked'],
-                'available': data['available'],
-                'on_hold': data['on_hold'],
-                'percentage': data['percentage']
-            })
 
-        return jsonify(brand_data)
+        return jsonify(brand_overview_payload(start_date, end_date))
 
     except Exception as e:
         print(f"Brand Overview API Error: {e}")
         return jsonify({"error": str(e)}), 500
 
 
-@app.route('/api/weekly-comparison')
+@bp.route('/api/weekly-comparison')
+@cached_response
+@admission('summary')
+@execution_profile('aggregate')
 def api_weekly_comparison():
     """API endpoint for weekly comparison data"""
     try:
-        # Get current week's data
-        today = datetime.now()
-        # Get Monday of current week
-        monday = today - timedelta(days=today.weekday())
-        sunday = monday + timedelta(days=6)
-
-        # Format dates for display
-        week_range = f"{monday.strftime('%b %d, %Y')} to {sunday.strftime('%b %d, %Y')}"
-
-        # Get inventory summary for current week with date filtering
-        summary = get_inventory_summary(
-            start_date=monday.strftime('%Y-%m-%d'),
-            end_date=sunday.strftime('%Y-%m-%d')
-        )
-
-        # Get form submissions from database
-        form_submissions = get_form_submissions_for_week(monday, sunday)
-
-        # Format data for frontend
-        weekly_data = []
-        for brand_code, data in summary['by_brand'].items():
-            weekly_data.append({
-                'brand': brand_code,
-                'scheduled': data['booked'],
-                'form_submissions': form_submissions.get(brand_code, 0)
-            })
-
-        return jsonify({
-            'week_range': week_range,
-            'data': weekly_data
-        })
+        return jsonify(weekly_comparison_payload())
 
     except Exception as e:
         print(f"Weekly Comparison API Error: {e}")
         return jsonify({"error": str(e)}), 500
 
 
-@app.route('/api/brand-product-breakdown')
+@bp.route('/api/brand-product-breakdown')
+@cached_response
+@admission('summary')
+@execution_profile('aggregate')
 def api_brand_product_breakdown():
     """API endpoint for brand product breakdown"""
     try:
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
+
+        return jsonify(product_breakdown_payload(start_date, end_date))
         
+    except Exception as e:
+        print(f"Brand Product Breakdown API Error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.route('/api/dashboard-summary')
+@cached_response
+@admission('summary')
+@execution_profile('aggregate')
+def api_dashboard_summary():
+    """API endpoint combining brand overview and product breakdown"""
+    try:
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+
+        # Both views are built from the same rollup result
+        rollup = get_inventory_rollup(start_date, end_date)
+        summary = get_inventory_summary(start_date, end_date, rollup=rollup)
+
+        return jsonify({
+            'totals': {
+                'total_slots': summary['total_slots'],
+                'booked': summary['booked'],
+                'available': summary['available'],
+                'on_hold': summary['on_hold']
+            },
+            'brand_overview': format_brand_overview(summary),
+            'product_breakdown': format_product_breakdown(rollup)
+        })
+
+    except Exception as e:
+        print(f"Dashboard Summary API Error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+# /api/batch: several dashboard payloads from one request and one connection
+BATCH_MAX_PARTS = 10
+BATCH_DEFAULT_PARTS = ('brand-overview', 'weekly-comparison',
+                       'brand-product-breakdown', 'clients', 'inventory')
+BATCH_SHARED_ARGS = ('start_date', 'end_date', 'limit', 'brand', 'status',
+                     'client', 'product')
+
+
+def _batch_inventory(params, shared):
+    return query_inventory_json_by_brand(
+        int(params.get('limit', 100)), params.get('brand'), params.get('status'),
+        params.get('client'), params.get('product'), params.get('start_date'),
+        params.get('end_date'), conn=shared['conn'])
+
+
+# Execution profile each batch part runs under
+_BATCH_PROFILES = {
+    'brand-overview': 'aggregate',
+    'weekly-comparison': 'aggregate',
+    'brand-product-breakdown': 'aggregate',
+    'clients': 'aggregate',
+    'inventory': 'interactive',
+}
+
+_BATCH_HANDLERS = {
+    'brand-overview': lambda params, shared: brand_overview_payload(
+        params.get('start_date'), params.get('end_date'), shared['get_rollup']),
+    'weekly-comparison': lambda params, shared: weekly_comparison_payload(
+        shared['get_rollup'], shared['conn']),
+    'brand-product-breakdown': lambda params, shared: product_breakdown_payload(
+        params.get('start_date'), params.get('end_date'), shared['get_rollup']),
+    'clients': lambda params, shared: clients_payload(shared['conn']),
+    'inventory': _batch_inventory,
+}
+
+
+def _batch_requests():
+    """Read the sub-requests from a POST body or from GET ?include=.
+
+    Raises ValueError when the POST body does not have the documented shape.
+    """
+    if request.method == 'POST':
+        body = request.get_json(silent=True)
+        if body is None:
+            body = {}
+        if not isinstance(body, dict) or not isinstance(body.get('requests', []), list):
+            raise ValueError('Body must be {"requests": [...]}')
+        parts = []
+        for part in body.get('requests', []):
+            if not isinstance(part, dict) or not isinstance(part.get('endpoint'), str):
+                raise ValueError('Each request must be an object with an "endpoint" string')
+            params = part.get('params') or {}
+            if not isinstance(params, dict):
+                raise ValueError('Request "params" must be an object')
+            parts.append((part.get('id') or part['endpoint'], part['endpoint'], params))
+        return parts
+
+    include = request.args.get('include')
+    names = include.split(',') if include else BATCH_DEFAULT_PARTS
+    params = {key: request.args[key] for key in BATCH_SHARED_ARGS if key in request.args}
+    return [(name, name, params) for name in names]
+
+
+@bp.route('/api/batch', methods=['GET', 'POST'])
+@admission('summary')
+def api_batch():
+    """Run several dashboard API calls in one round trip.
+
+    Parts share one database connection and one rollup per date range, so
+    brand overview and product breakdown never scan the slots twice.
+    POST {"requests": [{"endpoint": ..., "params": {...}, "id": ...}]}, or
+    GET ?include=brand-overview,clients with shared filter arguments.
+    """
+    started = time.time()
+    try:
+        parts = _batch_requests()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if len(parts) > BATCH_MAX_PARTS:
+        return jsonify({"error": f"At most {BATCH_MAX_PARTS} requests per batch"}), 400
+
+    conn = None
+    try:
         conn = get_db_connection()
-        cursor = create_cursor(conn)
-        
-        # Define brand tables
-        brand_tables = [
-            ('aa_inventory', 'AA'),
-            ('bob_inventory', 'BG'),
-            ('cfo_inventory', 'CFO'),
-            ('gt_inventory', 'GT'),
-            ('hrd_inventory', 'HRD'),
-        ]
-        
-        breakdown_data = {}
-        
-        for table, brand_code in brand_tables:
-            # Build query with duplicate handling
-            base_query = f"""
-            WITH latest_slots AS (
-                SELECT DISTINCT ON ("ID") *
-                FROM campaign_metadata.{table}
-                WHERE "ID" >= 8000
-                ORDER BY "ID", last_updated DESC
-            )
-        SELECT 
-                "Product",
-                COUNT(*) as total,
-                COUNT(CASE WHEN "Booked/Not Booked" = 'Booked' THEN 1 END) as booked,
-                COUNT(CASE WHEN "Booked/Not Booked" = 'Not Booked' THEN 1 END) as available,
-                COUNT(CASE WHEN "Booked/Not Booked" IN ('Hold', 'Hold ', 'hold', 'On hold') THEN 1 END) as on_hold
-            FROM latest_slots
-            WHERE "Product" IS NOT NULL
-            """
-
-            # Add date filtering if provided
-            if start_date and end_date:
-                date_filter = build_date_filtered_query(
-                    table, start_date, end_date)
-                query = base_query + date_filter + ' GROUP BY "Product" ORDER BY total DESC'
+        rollups = {}
+
+        def get_rollup(start_date=None, end_date=None):
+            key = (start_date, end_date)
+            if key not in rollups:
+                rollups[key] = get_inventory_rollup(start_date, end_date, conn)
+            return rollups[key]
+
+        shared = {'conn': conn, 'get_rollup': get_rollup}
+
+        # Part bodies are serialized one by one so the inventory JSON built
+        # by Postgres can be spliced in without being parsed again
+        results = []
+        batch_status = {}
+        for key, endpoint, params in parts:
+            part_started = time.time()
+            g.brand_status = None
+            g.execution_profile = _BATCH_PROFILES.get(endpoint, 'interactive')
+            handler = _BATCH_HANDLERS.get(endpoint)
+            if handler is None:
+                status, data = 400, json.dumps({"error": f"Unknown endpoint: {endpoint}"})
             else:
-                query = base_query + ' GROUP BY "Product" ORDER BY total DESC'
+                try:
+                    payload = handler(params, shared)
+                    status = 200
+                    data = payload if isinstance(payload, str) else json.dumps(payload, default=str)
+                except Exception as e:
+                    print(f"Batch part {endpoint} Error: {e}")
+                    conn.rollback()
+                    status, data = 500, json.dumps({"error": str(e)})
+            elapsed_ms = round((time.time() - part_started) * 1000, 1)
+            part_status = ''
+            if g.get('brand_status'):
+                part_status = (f', "partial": {json.dumps(response_is_partial())}, '
+                               f'"brand_status": {json.dumps(g.brand_status)}')
+                for brand_code, brand_status in g.brand_status.items():
+                    if batch_status.get(brand_code) in (None, 'ok'):
+                        batch_status[brand_code] = brand_status
+            results.append(
+                f'{json.dumps(str(key))}: {{"status": {status}, "elapsed_ms": {elapsed_ms}{part_status}, "data": {data}}}')
+        g.brand_status = batch_status
+
+        elapsed_ms = round((time.time() - started) * 1000, 1)
+        body = f'{{"results": {{{", ".join(results)}}}, "elapsed_ms": {elapsed_ms}}}'
+        return Response(body, mimetype='application/json')
 
-            try:
-                cursor.execute(query)
-                results = cursor.fetchall()
-                
-                products = []
-                for row in results:
-                    products.append({
-                        'product': row[0],
-                        'total': row[1],
-                        'booked': row[2],
-                        'available': row[3],
-                        'on_hold': row[4]
-                    })
-
-                breakdown_data[brand_code] = products
-                
-            except Exception as e:
-                print(f"Error getting product breakdown for {table}: {e}")
-                breakdown_data[brand_code] = []
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify(breakdown_data)
-        
     except Exception as e:
-        print(f"Brand Product Breakdown API Error: {e}")
+        print(f"Batch API Error: {e}")
         return jsonify({"error": str(e)}), 500
+    finally:
+        if conn:
+            return_db_connection(conn)
+
+
+# Server-sent events: one broadcaster per worker pushes dashboard payloads
+# to every open stream when the data changes
+STREAM_POLL_INTERVAL = int(os.getenv('STREAM_POLL_INTERVAL', '5'))
+STREAM_HEARTBEAT_INTERVAL = int(os.getenv('STREAM_HEARTBEAT_INTERVAL', '15'))
+SSE_MAX_SUBSCRIBERS = int(os.getenv('SSE_MAX_SUBSCRIBERS', '4'))
+
+_stream_lock = threading.Lock()
+_stream_state = {
+    'subscribers': set(),   # one queue per open stream
+    'version': None,        # data version the current event was built from
+    'event': None,          # latest encoded event
+    'event_id': 0,
+    'broadcaster': None,
+}
+
+
+def _brand_tables_version():
+    """Latest last_updated and row count of every brand table.
 
+    Cheap with the last_updated indexes; the count catches deletions.
+    """
+    query = ' UNION ALL '.join(
+        f"SELECT '{brand_code}', max(last_updated), count(*) FROM campaign_metadata.{table}"
+        for table, brand_code in BRAND_TABLES)
+    with db_connection() as conn:
+        cursor = create_cursor(conn)
+        try:
+            cursor.execute(query)
+            return tuple(cursor.fetchall())
+        finally:
+            cursor.close()
+
+
+def _stream_data_version():
+    """Identify the data the dashboard payload would be built from.
+
+    The aggregate watermarks and the view refresh time when there are any;
+    with neither (incremental aggregates off and no view), the brand tables
+    are probed directly, so the version still moves when the data does.
+    """
+    watermarks = None
+    if INCREMENTAL_AGGREGATES:
+        refresh_inventory_aggregates()
+        with _aggregate_lock:
+            watermarks = tuple(sorted(_aggregate_state['watermarks'].items()))
+    refreshed_at = _latest_slots_view['refreshed_at']
+    if watermarks is None and refreshed_at is None:
+        return _brand_tables_version(), None
+    return watermarks, refreshed_at
+
+
+def build_stream_event():
+    """Compute the brand overview and product breakdown once for all streams"""
+    rollup = get_inventory_rollup()
+    summary = get_inventory_summary(rollup=rollup)
+    return json.dumps({
+        'brand_overview': format_brand_overview(summary),
+        'product_breakdown': format_product_breakdown(rollup),
+    }, default=str)
+
+
+def _publish_stream_event(payload):
+    """Hand a new event to every subscriber, replacing any it has not read"""
+    with _stream_lock:
+        _stream_state['event_id'] += 1
+        event = f"id: {_stream_state['event_id']}\nevent: dashboard\ndata: {payload}\n\n"
+        _stream_state['event'] = event
+        for subscriber in _stream_state['subscribers']:
+            try:
+                subscriber.get_nowait()
+            except queue.Empty:
+                pass
+            subscriber.put_nowait(event)
+
+
+def _stream_broadcaster():
+    """Background loop watching the data version while anyone is listening"""
+    last_payload = None
+    while True:
+        time.sleep(STREAM_POLL_INTERVAL)
+        if not _stream_state['subscribers']:
+            continue
+        try:
+            version = _stream_data_version()
+            if version == _stream_state['version']:
+                continue
+            payload = build_stream_event()
+            _stream_state['version'] = version
+            # A new view refresh does not always mean new numbers
+            if payload != last_payload:
+                last_payload = payload
+                _publish_stream_event(payload)
+        except Exception as e:
+            print(f"Stream broadcaster error: {e}")
 
-@app.route('/api/debug/test-simple-inventory')
+
+def _start_stream_broadcaster():
+    with _stream_lock:
+        if _stream_state['broadcaster'] is None:
+            broadcaster = threading.Thread(
+                target=_stream_broadcaster, name='stream-broadcaster', daemon=True)
+            broadcaster.start()
+            _stream_state['broadcaster'] = broadcaster
+
+
+@bp.route('/api/stream')
+def api_stream():
+    """Server-sent events carrying brand overview and product breakdown updates"""
+    subscriber = queue.Queue(maxsize=1)
+    with _stream_lock:
+        if len(_stream_state['subscribers']) >= SSE_MAX_SUBSCRIBERS:
+            response = jsonify({"error": "Too many open streams, poll instead"})
+            response.status_code = 503
+            response.headers['Retry-After'] = str(STREAM_HEARTBEAT_INTERVAL)
+            return response
+        _stream_state['subscribers'].add(subscriber)
+        current_event = _stream_state['event']
+
+    def release():
+        with _stream_lock:
+            _stream_state['subscribers'].discard(subscriber)
+
+    def generate():
+        try:
+            yield f"retry: {STREAM_POLL_INTERVAL * 1000}\n\n"
+            if current_event:
+                yield current_event
+            while True:
+                try:
+                    yield subscriber.get(timeout=STREAM_HEARTBEAT_INTERVAL)
+                except queue.Empty:
+                    # Keeps proxies from closing an idle stream
+                    yield ": heartbeat\n\n"
+        finally:
+            release()
+
+    response = Response(generate(), mimetype='text/event-stream')
+    # The slot is taken before the body starts; closing the response gives
+    # it back even if the body is never iterated
+    response.call_on_close(release)
+    _start_stream_broadcaster()
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@bp.route('/api/debug/test-simple-inventory')
+@admission('debug')
+@db_role(PRIMARY)
 def api_debug_test_simple_inventory():
     """Minimal test - just get data from one table"""
+    conn = None
     try:
         conn = get_db_connection()
         cursor = create_cursor(conn)
@@ -764,7 +3655,6 @@ def api_debug_test_simple_inventory():
             })
         
         cursor.close()
-        conn.close()
         
         return jsonify({
             'status': 'success',
@@ -778,25 +3668,29 @@ def api_debug_test_simple_inventory():
             'error': str(e),
             'traceback': traceback.format_exc()
         }), 500
+    finally:
+        if conn:
+            return_db_connection(conn)
 
 
-@app.route('/api/debug/test-inventory-query')
+@bp.route('/api/debug/test-inventory-query')
+@admission('debug')
+@db_role(PRIMARY)
 def api_debug_test_inventory_query():
     """Debug endpoint to test inventory query exactly as used in inventory endpoint"""
+    conn = None
     try:
         conn = get_db_connection()
         cursor = create_cursor(conn)
         
+        note_data_freshness(*latest_slots_freshness())
+
         # Test with exact same query structure as inventory endpoint
         table = 'aa_inventory'
         brand_code = 'AA'
         
         base_query = f"""
-        WITH latest_slots AS (
-            SELECT DISTINCT ON ("ID") *
-            FROM campaign_metadata.{table}
-            WHERE "ID" >= 8000
-            ORDER BY "ID", last_updated DESC
+        WITH latest_slots AS ({latest_slots_sql(table, brand_code)}
         )
                 SELECT 
             inv."ID",
@@ -806,7 +3700,7 @@ def api_debug_test_inventory_query():
             COALESCE(cl."Client Name", 'No Client') as "Client",
             inv."Booking ID",
             inv."Media_Asset" as "Product",
-            inv."Price",
+            NULL as "Price",
             inv."last_updated"
         FROM latest_slots inv
             LEFT JOIN campaign_metadata.campaign_ledger cl 
@@ -847,7 +3741,6 @@ def api_debug_test_inventory_query():
                 }), 500
         
         cursor.close()
-        conn.close()
         
         return jsonify({
             'status': 'success',
@@ -862,15 +3755,23 @@ def api_debug_test_inventory_query():
             'error': str(e),
             'traceback': traceback.format_exc()
         }), 500
+    finally:
+        if conn:
+            return_db_connection(conn)
 
 
-@app.route('/api/debug/test-query')
+@bp.route('/api/debug/test-query')
+@admission('debug')
+@db_role(PRIMARY)
 def api_debug_test_query():
     """Debug endpoint to test database queries"""
+    conn = None
     try:
         conn = get_db_connection()
         cursor = create_cursor(conn)
         
+        note_data_freshness(*latest_slots_freshness())
+
         # Test simple query first
         test_results = {}
 
@@ -883,24 +3784,16 @@ def api_debug_test_query():
         test_results['simple_count'] = cursor.fetchone()[0]
 
         # Test 2: CTE query (like inventory endpoint)
-        cursor.execute("""
-            WITH latest_slots AS (
-                SELECT DISTINCT ON ("ID") *
-                FROM campaign_metadata.aa_inventory
-                WHERE "ID" >= 8000
-                ORDER BY "ID", last_updated DESC
+        cursor.execute(f"""
+            WITH latest_slots AS ({latest_slots_sql('aa_inventory', 'AA')}
             )
             SELECT COUNT(*) FROM latest_slots
         """)
         test_results['cte_count'] = cursor.fetchone()[0]
 
         # Test 3: Full SELECT query (like inventory endpoint)
-        cursor.execute("""
-            WITH latest_slots AS (
-                SELECT DISTINCT ON ("ID") *
-                FROM campaign_metadata.aa_inventory
-                WHERE "ID" >= 8000
-                ORDER BY "ID", last_updated DESC
+        cursor.execute(f"""
+            WITH latest_slots AS ({latest_slots_sql('aa_inventory', 'AA')}
             )
             SELECT "ID", "Website_Name", "Booked/Not Booked"
             FROM latest_slots
@@ -909,12 +3802,8 @@ def api_debug_test_query():
         test_results['select_query_rows'] = len(cursor.fetchall())
 
         # Test 3b: SELECT with JOIN (like fixed inventory endpoint)
-        cursor.execute("""
-            WITH latest_slots AS (
-                SELECT DISTINCT ON ("ID") *
-                FROM campaign_metadata.aa_inventory
-                WHERE "ID" >= 8000
-                ORDER BY "ID", last_updated DESC
+        cursor.execute(f"""
+            WITH latest_slots AS ({latest_slots_sql('aa_inventory', 'AA')}
             )
             SELECT 
                 inv."ID",
@@ -944,7 +3833,6 @@ def api_debug_test_query():
         test_results['clients_query_rows'] = len(cursor.fetchall())
 
         cursor.close()
-        conn.close()
 
         return jsonify({
             'status': 'success',
@@ -959,60 +3847,90 @@ def api_debug_test_query():
             'error': str(e),
             'traceback': traceback.format_exc()
         }), 500
+    finally:
+        if conn:
+            return_db_connection(conn)
 
 
-@app.route('/api/clients')
-def api_clients():
-    """API endpoint for client data"""
-    try:
-        conn = get_db_connection()
-        cursor = create_cursor(conn)
+@bp.route('/api/debug/query-timings')
+@admission('debug')
+def api_debug_query_timings():
+    """Query timings per execution profile, next to each profile's settings"""
+    return jsonify({
+        'profiles': EXECUTION_PROFILES,
+        'timings': query_timing_report(),
+        'statements': statement_registry_status(),
+    })
 
-        # Define brand tables
-        brand_tables = [
-            ('aa_inventory', 'AA'),
-            ('bob_inventory', 'BG'),
-            ('cfo_inventory', 'CFO'),
-            ('gt_inventory', 'GT'),
-            ('hrd_inventory', 'HRD'),
-        ]
 
-        all_clients = set()
+@bp.route('/api/debug/boot')
+@admission('debug')
+def api_debug_boot():
+    """Database driver in use and how long this worker took to boot"""
+    return jsonify(boot_report())
 
-        for table, brand_code in brand_tables:
-            query = f"""
-            SELECT DISTINCT cl."Client Name" as client
-            FROM campaign_metadata.{table} inv
-            INNER JOIN campaign_metadata.campaign_ledger cl 
-                ON inv."Booking ID" = cl."Booking ID" 
-                AND cl."Brand" = '{brand_code}'
-            WHERE inv."ID" >= 8000
-            AND cl."Client Name" IS NOT NULL 
-            AND cl."Client Name" != ''
-            """
+
+def clients_query(table, brand_code):
+    """The statement for the distinct client names booked on one brand, and its parameters"""
+    statement = registered_statement('clients', table, (), lambda: sql.SQL("""
+        SELECT DISTINCT cl."Client Name" as client
+        FROM {table} inv
+        INNER JOIN campaign_metadata.campaign_ledger cl 
+            ON inv."Booking ID" = cl."Booking ID" 
+            AND cl."Brand" = %s
+        WHERE inv."ID" >= 8000
+        AND cl."Client Name" IS NOT NULL 
+        AND cl."Client Name" != ''
+        """).format(table=brand_table_identifier(table)))
+    return statement, [brand_code]
+
+
+def clients_payload(conn=None):
+    """Build the /api/clients response body"""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    cursor = create_cursor(conn)
+
+    all_clients = set()
+    try:
+        for table, brand_code in BRAND_TABLES:
+            statement, params = clients_query(table, brand_code)
 
             try:
                 print(f"DEBUG: Executing clients query for {table} (brand: {brand_code})")
-                cursor.execute(query)
+                apply_execution_profile(cursor)
+                execute_statement(cursor, statement, params)
                 results = cursor.fetchall()
                 print(f"DEBUG: Clients query returned {len(results)} rows for {table}")
-                
+            
                 for row in results:
                     all_clients.add(row[0])
-                    print(f"DEBUG: Total unique clients collected so far: {len(all_clients)}")
             except Exception as e:
                 print(f"ERROR getting clients from {table}: {e}")
                 import traceback
                 print(f"ERROR traceback: {traceback.format_exc()}")
+                conn.rollback()
                 continue
-        
+    finally:
         cursor.close()
-        conn.close()
-        
-        # Return as array of objects with client_name for frontend compatibility
-        client_list = [{'client_name': name} for name in sorted(list(all_clients))]
-        print(f"DEBUG: Clients API returning {len(client_list)} total clients")
-        return jsonify(client_list)
+        if own_conn:
+            return_db_connection(conn)
+
+    # Return as array of objects with client_name for frontend compatibility
+    client_list = [{'client_name': name} for name in sorted(list(all_clients))]
+    print(f"DEBUG: Clients API returning {len(client_list)} total clients")
+    return client_list
+
+
+@bp.route('/api/clients')
+@cached_response
+@admission('summary')
+@execution_profile('aggregate')
+def api_clients():
+    """API endpoint for client data"""
+    try:
+        return jsonify(clients_payload())
         
     except Exception as e:
         print(f"Clients API Error: {e}")
@@ -1021,5 +3939,304 @@ def api_clients():
         return jsonify({"error": str(e)}), 500
 
 
+# Warmup: each worker opens its minimum pool and precomputes the first
+# dashboard requests before /readyz reports it ready
+WARMUP_POOL_SIZE = int(os.getenv('WARMUP_POOL_SIZE', '2'))
+WARMUP_RETRY_INTERVAL = float(os.getenv('WARMUP_RETRY_INTERVAL', '5'))
+WARMUP_PATHS = ('/api/brand-overview', '/api/weekly-comparison', '/api/clients')
+
+_worker_lock = threading.Lock()
+_worker = {'pid': None}
+_warmup = {'state': 'cold', 'started': None, 'finished': None, 'steps': {}, 'error': None}
+
+
+def open_minimum_pool(role, size):
+    """Open size connections for role and leave them idle in the pool"""
+    conns = []
+    try:
+        for _ in range(size):
+            conns.append(get_db_connection(role))
+    finally:
+        for conn in conns:
+            return_db_connection(conn)
+
+
+def warm_up(app):
+    """Warm this worker, retrying until the database answers"""
+    _warmup['state'] = 'warming'
+    _warmup['started'] = time.time()
+    client = app.test_client()
+    while True:
+        steps = {}
+        try:
+            started = time.time()
+            for url in DB_REPLICA_URLS:
+                check_replica_lag(url)
+            size = min(WARMUP_POOL_SIZE, DB_POOL_SIZE)
+            open_minimum_pool(PRIMARY, size)
+            if DB_REPLICA_URLS:
+                open_minimum_pool('replica', size)
+            steps['pool'] = round(time.time() - started, 3)
+
+            # Through the real views, so the response cache, rollups and
+            # prepared statements are all filled the way a user fills them
+            for path in WARMUP_PATHS:
+                started = time.time()
+                response = client.get(path)
+                if response.status_code != 200:
+                    raise Exception(f"{path} returned {response.status_code}")
+                steps[path] = round(time.time() - started, 3)
+        except Exception as e:
+            _warmup['error'] = str(e)
+            _warmup['steps'] = steps
+            print(f"Warmup failed, retrying in {WARMUP_RETRY_INTERVAL:.0f}s: {e}")
+            time.sleep(WARMUP_RETRY_INTERVAL)
+            continue
+
+        _warmup.update(state='ready', finished=time.time(), steps=steps, error=None)
+        # Readiness needs a fresh ping too; take one now rather than
+        # waiting for the prober's next round
+        probe_health()
+        print(f"Worker {os.getpid()} warm in {_warmup['finished'] - _warmup['started']:.2f}s")
+        return
+
+
+def warmup_status():
+    """Warmup state of this worker, with per-step timings in seconds"""
+    status = dict(_warmup)
+    if status['started'] is not None:
+        status['seconds'] = round((status['finished'] or time.time()) - status['started'], 3)
+    return status
+
+
+def start_worker(app):
+    """Start this process's background jobs and warmup, once per process.
+
+    Threads and connections do not survive fork, so under gunicorn's
+    preload_app this runs in each worker (post_worker_init), never in the
+    master that built the app.
+    """
+    with _worker_lock:
+        if _worker['pid'] == os.getpid():
+            return
+        _worker['pid'] = os.getpid()
+    start_background_jobs()
+    _start_health_prober()
+    threading.Thread(target=warm_up, args=(app,), name='warmup', daemon=True).start()
+
+
+@bp.before_app_request
+def ensure_worker_started():
+    # Servers without a startup hook (flask run, test clients) start the
+    # worker on their first request
+    start_worker(current_app._get_current_object())
+
+
+# Health checks: /healthz answers from memory and /readyz from the health
+# prober's last snapshot, so load balancer checks never reach the warehouse
+HEALTH_PROBE_INTERVAL = float(os.getenv('HEALTH_PROBE_INTERVAL', '10'))
+READY_MAX_PROBE_AGE = float(os.getenv('READY_MAX_PROBE_AGE', '30'))
+# A warm worker answers 503 after this many consecutive failed pings, and
+# 200 again after READY_RECOVERY_THRESHOLD consecutive good ones
+READY_FAILURE_THRESHOLD = int(os.getenv('READY_FAILURE_THRESHOLD', '6'))
+READY_RECOVERY_THRESHOLD = int(os.getenv('READY_RECOVERY_THRESHOLD', '2'))
+
+_health = {
+    'checked_at': None,
+    'database': None,     # {'ok', 'latency_ms', 'target', 'error'}
+    'pool': None,
+    'admission': None,
+    'caches': None,
+    'watermark': None,
+}
+_health_prober = {'thread': None}
+# Consecutive ping outcomes; only the prober thread writes these
+_ping_streak = {'failures': 0, 'successes': 0, 'failing': False}
+
+
+def _age_seconds(value):
+    """Seconds since a timestamp (epoch seconds or datetime), or None"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        value = value.timestamp() if value.tzinfo else value.replace(tzinfo=timezone.utc).timestamp()
+    return round(time.time() - value, 1)
+
+
+def probe_health():
+    """Ping the database and snapshot pool, cache and watermark state"""
+    started = time.time()
+    database = {'ok': False, 'latency_ms': None, 'target': None, 'error': None}
+    conn = None
+    try:
+        conn = get_db_connection('replica')
+        database['target'] = PRIMARY if _connection_targets.get(conn) == PRIMARY else 'replica'
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1")
+        cursor.close()
+        database['ok'] = True
+    except Exception as e:
+        database['error'] = str(e)
+    finally:
+        if conn is not None:
+            return_db_connection(conn)
+    database['latency_ms'] = round((time.time() - started) * 1000, 1)
+    _record_ping(database['ok'])
+
+    pool = pool_status()
+    pool['saturation'] = round(pool['in_use'] / pool['size'], 2) if pool['size'] else None
+    admission = {}
+    for name, budget in _admission_budgets.items():
+        with budget['condition']:
+            admission[name] = {key: budget[key] for key in ('active', 'limit', 'waiting', 'queue')}
+
+    with _aggregate_lock:
+        watermarks = [w for w in _aggregate_state['watermarks'].values() if w is not None]
+        aggregates_refreshed = _aggregate_state['refreshed_at']
+    newest = max((_naive_utc(w) for w in watermarks), default=None)
+
+    _health.update(
+        checked_at=time.time(),
+        database=database,
+        pool=pool,
+        admission=admission,
+        caches={
+            'latest_slots_age_seconds': _age_seconds(_latest_slots_view['refreshed_at']),
+            'aggregates_age_seconds': _age_seconds(aggregates_refreshed),
+            'bootstrap_age_seconds': _age_seconds(_index_page['bootstrap_built']),
+            'response_cache_entries': len(_response_cache),
+        },
+        watermark={
+            'newest': newest.isoformat() if newest else None,
+            'age_seconds': _age_seconds(newest),
+        },
+    )
+
+
+def _record_ping(ok):
+    """Count consecutive ping outcomes and flip failing with hysteresis"""
+    if ok:
+        _ping_streak['failures'] = 0
+        _ping_streak['successes'] += 1
+        if _ping_streak['failing'] and _ping_streak['successes'] >= READY_RECOVERY_THRESHOLD:
+            _ping_streak['failing'] = False
+            print(f"Database ping recovered after {_ping_streak['successes']} checks; readiness restored")
+    else:
+        _ping_streak['successes'] = 0
+        _ping_streak['failures'] += 1
+        if not _ping_streak['failing'] and _ping_streak['failures'] >= READY_FAILURE_THRESHOLD:
+            _ping_streak['failing'] = True
+            print(f"Database ping failed {_ping_streak['failures']} times in a row; reporting not ready")
+
+
+def _health_probe_loop():
+    """Background loop keeping the health snapshot current"""
+    while True:
+        try:
+            probe_health()
+        except Exception as e:
+            print(f"Error probing health: {e}")
+        time.sleep(HEALTH_PROBE_INTERVAL)
+
+
+def _start_health_prober():
+    with _worker_lock:
+        if _health_prober['thread'] is None:
+            thread = threading.Thread(target=_health_probe_loop, name='health-prober', daemon=True)
+            thread.start()
+            _health_prober['thread'] = thread
+
+
+def health_status():
+    """Readiness from the last health snapshot; does no I/O.
+
+    Ready once warm and while the last database ping succeeded within
+    READY_MAX_PROBE_AGE seconds. Pool, cache and watermark figures are
+    reported for the operator and do not affect readiness, so a busy or
+    lagging worker keeps its traffic. serving is what /readyz answers on:
+    warm, and not past READY_FAILURE_THRESHOLD consecutive failed pings
+    without READY_RECOVERY_THRESHOLD good ones since.
+    """
+    snapshot = dict(_health)
+    probe_age = _age_seconds(snapshot['checked_at'])
+    database = snapshot['database'] or {}
+    warm = _warmup['state'] == 'ready'
+    ping_ok = bool(database.get('ok')) and probe_age is not None and probe_age <= READY_MAX_PROBE_AGE
+    streak = dict(_ping_streak)
+    snapshot.update(ready=warm and ping_ok, warm=warm, serving=warm and not streak['failing'],
+                    ping_failures=streak['failures'], probe_age_seconds=probe_age,
+                    warmup=warmup_status())
+    return snapshot
+
+
+@bp.route('/healthz')
+def healthz():
+    """Liveness: the process is up and serving; no I/O"""
+    return jsonify({'status': 'ok', 'pid': os.getpid()})
+
+
+@bp.route('/readyz')
+def readyz():
+    """Readiness: 503 until warm, then 200 while the database answers.
+
+    A single failed ping only shows as ready: false in the body. The 503
+    comes after READY_FAILURE_THRESHOLD consecutive failures and clears
+    after READY_RECOVERY_THRESHOLD good pings, so a blip does not pull the
+    worker from rotation and a recovering database does not flap it. Keep
+    the threshold times HEALTH_PROBE_INTERVAL above the platform's restart
+    grace so an outage a restart cannot fix does not restart every worker.
+    """
+    status = health_status()
+    return jsonify(status), 200 if status['serving'] else 503
+
+
+def create_app():
+    """Build the dashboard app around the blueprint.
+
+    Nothing here starts threads or opens connections, so the app can be
+    built in a preloading master and forked; each serving process then
+    calls start_worker.
+    """
+    app = Flask(__name__)
+    CORS(app, expose_headers=['X-Data-Source', 'X-Data-Refreshed-At', 'X-Data-Age-Seconds', 'X-Cache',
+                              'X-Partial', 'X-Brand-Status', 'X-Database'])
+    app.register_blueprint(bp)
+    load_index_page()
+    return app
+
+
+def boot_report():
+    """Driver detection, boot timings and warmup state for this worker"""
+    return {
+        'pid': os.getpid(),
+        'driver': db_driver.describe(),
+        'driver_detect_seconds': round(db_driver.DETECT_SECONDS, 3),
+        'cooperative': GEVENT_MODE,
+        'load_seconds': round(_boot['loaded'] - BOOT_STARTED, 3) if _boot['loaded'] else None,
+        'worker_boot_seconds': _boot['worker_boot_seconds'],
+        'warmup': warmup_status(),
+    }
+
+
+def note_worker_boot(seconds):
+    """Record the fork-to-ready time measured by the gunicorn hooks"""
+    _boot['worker_boot_seconds'] = round(seconds, 3)
+
+
+def boot_summary():
+    """One-line boot report for the server log"""
+    report = boot_report()
+    mode = ', cooperative' if report['cooperative'] else ''
+    return f"loaded in {report['load_seconds']:.2f}s ({report['driver']}{mode})"
+
+
+_boot = {'loaded': None, 'worker_boot_seconds': None}
+
+app = create_app()
+_boot['loaded'] = time.time()
+
+
 if __name__ == '__main__':
+    print(f"Dashboard {boot_summary()}")
+    start_worker(app)
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Concurrency test for the gevent worker profile: N slow queries started
+together in one process should finish in about the time of one.
+
+Runs the queries in a child process so gevent's monkey-patching does not
+leak into the test runner. Needs gevent and a reachable database (DB_*
+environment variables); it is skipped otherwise.
+"""
+import os
+import subprocess
+import sys
+import unittest
+
+CONCURRENT_QUERIES = 20
+QUERY_SECONDS = 1
+
+CHILD_SCRIPT = """
+from gevent import monkey
+monkey.patch_all()
+
+import sys
+import time
+import gevent
+import simple_dashboard
+
+assert simple_dashboard.GEVENT_MODE, "database driver was not made cooperative"
+
+def slow_query():
+    conn = simple_dashboard.get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT pg_sleep(%s)", (float(sys.argv[2]),))
+        cursor.close()
+    finally:
+        simple_dashboard.return_db_connection(conn)
+
+started = time.time()
+greenlets = [gevent.spawn(slow_query) for _ in range(int(sys.argv[1]))]
+gevent.joinall(greenlets, raise_error=True)
+print(f"ELAPSED {time.time() - started:.2f}")
+"""
+
+
+def database_available():
+    try:
+        import simple_dashboard
+        conn = simple_dashboard.get_db_connection()
+        simple_dashboard.return_db_connection(conn)
+        return True
+    except Exception as e:
+        print(f"Database not available: {e}")
+        return False
+
+
+class GeventConcurrencyTest(unittest.TestCase):
+
+    def setUp(self):
+        try:
+            import gevent  # noqa: F401
+        except ImportError:
+            self.skipTest("gevent not installed")
+        if not database_available():
+            self.skipTest("database not reachable")
+
+    def test_slow_queries_run_concurrently(self):
+        result = subprocess.run(
+            [sys.executable, '-c', CHILD_SCRIPT, str(CONCURRENT_QUERIES), str(QUERY_SECONDS)],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, timeout=CONCURRENT_QUERIES * QUERY_SECONDS + 60)
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+
+        elapsed = float(result.stdout.rsplit('ELAPSED ', 1)[1])
+        print(f"{CONCURRENT_QUERIES} x {QUERY_SECONDS}s queries took {elapsed:.2f}s in one process")
+        # Serial execution would take CONCURRENT_QUERIES * QUERY_SECONDS
+        self.assertLess(elapsed, QUERY_SECONDS * 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
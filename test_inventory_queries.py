@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Database tests for the inventory listing and changes feed: per-brand pages
+list each booking ID once under its latest brand, a brand that runs out of
+time is left out and flags the page partial, deletion tombstones are sent
+once, and batch results are keyed by their request ids.
+
+Needs a reachable database (DB_* environment variables) and is skipped
+otherwise. Rows are inserted inside a transaction that is rolled back.
+"""
+import json
+import unittest
+from datetime import datetime, timedelta
+
+import simple_dashboard
+from simple_dashboard import DeadlineExceeded, PRIMARY
+
+
+def database_available():
+    try:
+        conn = simple_dashboard.get_db_connection(PRIMARY)
+        simple_dashboard.return_db_connection(conn)
+        return True
+    except Exception as e:
+        print(f"Database not available: {e}")
+        return False
+
+
+class DatabaseTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        if not database_available():
+            raise unittest.SkipTest("database not available")
+
+    def setUp(self):
+        self.context = simple_dashboard.app.test_request_context('/api/inventory')
+        self.context.push()
+        self.conn = simple_dashboard.get_db_connection(PRIMARY)
+
+    def tearDown(self):
+        self.conn.rollback()
+        simple_dashboard.return_db_connection(self.conn)
+        self.context.pop()
+
+
+class BrandPageTest(DatabaseTestCase):
+
+    def insert_bg_copy(self, booking_id, last_updated):
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT max("ID") FROM campaign_metadata.bob_inventory')
+        slot_id = cursor.fetchone()[0] + 1
+        cursor.execute("""
+            INSERT INTO campaign_metadata.bob_inventory
+                ("ID", "Website_Name", "Booked/Not Booked", "Dates", "Booking ID",
+                 "Media_Asset", "Product", last_updated)
+            VALUES (%s, 'test', 'Booked', '2026-10-20', %s, 'test', 'test', %s)
+        """, (slot_id, booking_id, last_updated))
+        cursor.close()
+
+    def aa_booking_ids(self, count):
+        """Booking IDs the listing currently shows under AA"""
+        rows = json.loads(simple_dashboard.query_inventory_json(100000, conn=self.conn))
+        booking_ids = [row['booking_id'] for row in rows if row['brand'] == 'AA'][:count]
+        if len(booking_ids) < count:
+            self.skipTest("not enough AA bookings")
+        return booking_ids
+
+    def test_booking_listed_once_under_latest_brand(self):
+        newer, older = self.aa_booking_ids(2)
+        self.insert_bg_copy(newer, datetime.now() + timedelta(days=1))
+        self.insert_bg_copy(older, datetime(2000, 1, 1))
+
+        rows = json.loads(simple_dashboard.query_inventory_json_by_brand(100000, conn=self.conn))
+        booking_ids = [row['booking_id'] for row in rows]
+        self.assertEqual(len(booking_ids), len(set(booking_ids)))
+        brands = {row['booking_id']: row['brand'] for row in rows}
+        self.assertEqual(brands[newer], 'BG')
+        self.assertEqual(brands[older], 'AA')
+
+        # Brand by brand lists the same page as the single query
+        single = json.loads(simple_dashboard.query_inventory_json(100000, conn=self.conn))
+        self.assertEqual(sorted(booking_ids), sorted(row['booking_id'] for row in single))
+
+    def test_pages_are_full(self):
+        self.insert_bg_copy(self.aa_booking_ids(1)[0], datetime.now() + timedelta(days=1))
+        for limit in (1, 30, 250):
+            with self.subTest(limit=limit):
+                rows = json.loads(simple_dashboard.query_inventory_json_by_brand(limit, conn=self.conn))
+                self.assertEqual(len(rows), limit)
+                slots = simple_dashboard.query_inventory_slots_by_brand(limit, conn=self.conn)
+                self.assertEqual([slot['booking_id'] for slot in slots],
+                                 [row['booking_id'] for row in rows])
+
+    def test_brand_out_of_time_is_left_out(self):
+        brands = []
+
+        def take(cursor, remaining):
+            rows = cursor.fetchall()
+            if rows and rows[0][-1] == 'GT':
+                raise DeadlineExceeded()
+            brands.extend(row[-1] for row in rows)
+            return len(rows)
+
+        simple_dashboard.read_inventory_by_brand(
+            lambda remaining, brand_code: simple_dashboard.brand_page_query(
+                simple_dashboard.inventory_rows_query, remaining, brand_code),
+            take, 100000, conn=self.conn)
+        statuses = simple_dashboard.g.brand_status
+        self.assertEqual(statuses['GT'], 'timeout')
+        self.assertEqual({brand_code for brand_code, status in statuses.items() if status == 'ok'},
+                         {'AA', 'BG', 'CFO', 'HRD'})
+        self.assertNotIn('GT', brands)
+        self.assertTrue(simple_dashboard.response_is_partial())
+
+
+class TombstoneTest(DatabaseTestCase):
+
+    def test_deletion_sent_once(self):
+        state = simple_dashboard._aggregate_state
+        with simple_dashboard._aggregate_lock:
+            state['tombstone_seq'] += 1
+            state['tombstones'].append((state['tombstone_seq'], datetime.now(), 'CFO', -1))
+        try:
+            # Far enough ahead that no slot has changed since, and just
+            # before the new tombstone in this process's numbering
+            since = (datetime.now() + timedelta(days=365), None, None,
+                     (simple_dashboard.tombstone_epoch(), state['tombstone_seq'] - 1))
+            first = simple_dashboard.get_inventory_changes(since)
+            self.assertIn({'brand': 'CFO', 'id': -1, 'reason': 'deleted'}, first['tombstones'])
+
+            second = simple_dashboard.get_inventory_changes(
+                simple_dashboard.parse_watermark(first['watermark']))
+            self.assertEqual(second['slots'], [])
+            self.assertNotIn(-1, [tombstone['id'] for tombstone in second['tombstones']])
+
+            other = simple_dashboard.get_inventory_changes(since, brand='AA')
+            self.assertNotIn(-1, [tombstone['id'] for tombstone in other['tombstones']])
+        finally:
+            with simple_dashboard._aggregate_lock:
+                state['tombstones'].remove(
+                    next(t for t in state['tombstones'] if t[3] == -1))
+
+
+class BatchKeysTest(DatabaseTestCase):
+
+    def test_numeric_ids_become_string_keys(self):
+        with simple_dashboard.app.test_request_context('/api/batch', method='POST', json={
+                'requests': [{'endpoint': 'clients', 'id': 1},
+                             {'endpoint': 'no-such-endpoint', 'id': 2}]}):
+            response = simple_dashboard.api_batch()
+            body = json.loads(response.get_data())
+        self.assertEqual(set(body['results']), {'1', '2'})
+        self.assertEqual(body['results']['1']['status'], 200)
+        self.assertEqual(body['results']['2']['status'], 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
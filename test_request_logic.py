@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the request handling logic that needs no database: since=
+watermarks, Accept-Encoding negotiation, single-flight coalescing and
+batch body validation.
+"""
+import threading
+import time
+import unittest
+from datetime import datetime
+
+import simple_dashboard
+from simple_dashboard import (DeadlineExceeded, format_watermark, negotiate_encoding,
+                              parse_watermark, single_flight)
+
+
+class WatermarkTest(unittest.TestCase):
+
+    def test_bare_timestamp(self):
+        self.assertEqual(parse_watermark('2026-10-01T12:30:00'),
+                         (datetime(2026, 10, 1, 12, 30), None, None, None))
+
+    def test_timezone_is_normalized_to_naive_utc(self):
+        last_updated, _, _, _ = parse_watermark('2026-10-01T14:30:00+02:00')
+        self.assertEqual(last_updated, datetime(2026, 10, 1, 12, 30))
+        last_updated, _, _, _ = parse_watermark('2026-10-01T12:30:00Z')
+        self.assertEqual(last_updated, datetime(2026, 10, 1, 12, 30))
+
+    def test_keyset_and_tombstone_position(self):
+        self.assertEqual(parse_watermark('2026-10-01T12:30:00,BG,42;1f2e.7'),
+                         (datetime(2026, 10, 1, 12, 30), 'BG', 42, ('1f2e', 7)))
+        self.assertEqual(parse_watermark('2026-10-01T12:30:00;1f2e.0'),
+                         (datetime(2026, 10, 1, 12, 30), None, None, ('1f2e', 0)))
+
+    def test_round_trip(self):
+        for keyset in [(datetime(2026, 10, 1, 12, 30, 0, 250), None, None, None),
+                       (datetime(2026, 10, 1, 12, 30), 'HRD', 7, None),
+                       (datetime(2026, 10, 1, 12, 30), 'AA', 1, ('abc', 12)),
+                       (datetime(2026, 10, 1, 12, 30), None, None, ('abc', 3))]:
+            self.assertEqual(parse_watermark(format_watermark(*keyset)), keyset)
+
+    def test_malformed(self):
+        for value in ['', 'yesterday', '2026-10-01T12:30:00,BG',
+                      '2026-10-01T12:30:00,BG,x', '2026-10-01T12:30:00,,4',
+                      '2026-10-01T12:30:00;', '2026-10-01T12:30:00;abc',
+                      '2026-10-01T12:30:00;abc.', '2026-10-01T12:30:00;.3',
+                      '2026-10-01T12:30:00;abc.x']:
+            with self.subTest(value=value):
+                self.assertRaises(ValueError, parse_watermark, value)
+
+    def test_tombstone_epoch_is_stable_within_a_process(self):
+        self.assertEqual(simple_dashboard.tombstone_epoch(), simple_dashboard.tombstone_epoch())
+
+
+class NegotiateEncodingTest(unittest.TestCase):
+
+    def test_gzip(self):
+        self.assertEqual(negotiate_encoding('gzip'), 'gzip')
+        self.assertEqual(negotiate_encoding('deflate, GZIP;q=0.5'), 'gzip')
+
+    def test_nothing_acceptable(self):
+        self.assertIsNone(negotiate_encoding(''))
+        self.assertIsNone(negotiate_encoding('identity'))
+        self.assertIsNone(negotiate_encoding('gzip;q=0'))
+        self.assertIsNone(negotiate_encoding('gzip;q=junk'))
+
+    def test_brotli_preferred_when_available(self):
+        expected = 'br' if simple_dashboard.BROTLI_AVAILABLE else 'gzip'
+        self.assertEqual(negotiate_encoding('gzip, deflate, br'), expected)
+        self.assertEqual(negotiate_encoding('br;q=0, gzip'), 'gzip')
+
+
+class SingleFlightTest(unittest.TestCase):
+    """A leader computes while a second caller for the same key waits on it"""
+
+    def run_pair(self, leader_compute, waiter_compute, key):
+        release = threading.Event()
+        outcomes = {}
+
+        def leader():
+            def compute():
+                release.wait(5)
+                return leader_compute()
+            try:
+                outcomes['leader'] = single_flight(key, compute)
+            except Exception as e:
+                outcomes['leader'] = e
+
+        def waiter():
+            try:
+                outcomes['waiter'] = single_flight(key, waiter_compute)
+            except Exception as e:
+                outcomes['waiter'] = e
+
+        leader_thread = threading.Thread(target=leader)
+        leader_thread.start()
+        while key not in simple_dashboard._inflight:
+            time.sleep(0.01)
+        waiter_thread = threading.Thread(target=waiter)
+        waiter_thread.start()
+        time.sleep(0.1)
+        release.set()
+        leader_thread.join(5)
+        waiter_thread.join(5)
+        self.assertNotIn(key, simple_dashboard._inflight)
+        return outcomes['leader'], outcomes['waiter']
+
+    def test_waiter_shares_the_leader_result(self):
+        calls = []
+        leader, waiter = self.run_pair(lambda: calls.append('leader') or 'shared',
+                                       lambda: calls.append('waiter') or 'own', 'sf-shared')
+        self.assertEqual((leader, waiter), ('shared', 'shared'))
+        self.assertEqual(calls, ['leader'])
+
+    def test_waiter_computes_after_leader_deadline(self):
+        def out_of_time():
+            raise DeadlineExceeded()
+        leader, waiter = self.run_pair(out_of_time, lambda: 'own', 'sf-deadline')
+        self.assertIsInstance(leader, DeadlineExceeded)
+        self.assertEqual(waiter, 'own')
+
+    def test_waiter_gets_other_leader_errors(self):
+        def broken():
+            raise ZeroDivisionError('boom')
+        leader, waiter = self.run_pair(broken, lambda: 'own', 'sf-error')
+        self.assertIsInstance(leader, ZeroDivisionError)
+        self.assertIs(waiter, leader)
+
+    def test_sequential_callers_compute_again(self):
+        self.assertEqual(single_flight('sf-sequential', lambda: 1), 1)
+        self.assertEqual(single_flight('sf-sequential', lambda: 2), 2)
+
+
+class BatchRequestsTest(unittest.TestCase):
+
+    def parts(self, body=None, method='POST', query_string=None, data=None):
+        with simple_dashboard.app.test_request_context(
+                '/api/batch', method=method, json=body, data=data,
+                query_string=query_string):
+            return simple_dashboard._batch_requests()
+
+    def test_post_parts(self):
+        self.assertEqual(self.parts({'requests': [
+            {'endpoint': 'clients'},
+            {'endpoint': 'brand-overview', 'params': {'start_date': '2026-10-01'}, 'id': 7},
+        ]}), [('clients', 'clients', {}),
+              (7, 'brand-overview', {'start_date': '2026-10-01'})])
+
+    def test_empty_or_unparsable_body(self):
+        self.assertEqual(self.parts({}), [])
+        self.assertEqual(self.parts(data='not json'), [])
+
+    def test_malformed_bodies(self):
+        for body in [[], ['clients'], {'requests': 'clients'}, {'requests': ['clients']},
+                     {'requests': [{'params': {}}]}, {'requests': [{'endpoint': 3}]},
+                     {'requests': [{'endpoint': 'clients', 'params': ['x']}]}]:
+            with self.subTest(body=body):
+                self.assertRaises(ValueError, self.parts, body)
+
+    def test_get_include(self):
+        self.assertEqual(self.parts(method='GET', query_string={
+            'include': 'clients,brand-overview', 'start_date': '2026-10-01', 'other': '5'}),
+            [('clients', 'clients', {'start_date': '2026-10-01'}),
+             ('brand-overview', 'brand-overview', {'start_date': '2026-10-01'})])
+        self.assertEqual([name for name, _, _ in self.parts(method='GET')],
+                         list(simple_dashboard.BATCH_DEFAULT_PARTS))
+
+
+if __name__ == '__main__':
+    unittest.main()